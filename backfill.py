@@ -0,0 +1,149 @@
+"""
+Ingest a directory of statement PDFs without going through Telegram, e.g. when onboarding years of statements.
+
+    python -m backfill --chat-id 123456789 path/to/statements
+
+Statements in a known bank layout are parsed without the LLM. For the rest, text is extracted from the PDFs
+in the process pool (PDF_WORKERS) and the LLM requests are bounded by LLM_MAX_CONCURRENCY. Statements whose PDF is already in the chat's transaction store (by content hash) are skipped.
+Set ANTHROPIC_BASE_URL to run against a local fake Anthropic API.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+
+from src.handlers.process_new_cc_statement import save_statement
+from src.llm.categorization import categorize_rows
+from src.llm.extraction import extract_transactions
+from src.parsers import parse_statement_async
+from src.utilities.data_utilities import file_sha256
+from src.utilities.image_utilities import pdf_to_pages_async
+from src.utilities.metrics import command_context, metrics, stage
+from src.utilities.user_data import UserData, get_user_data
+
+logging.basicConfig(
+    format='%(name)s-%(levelname)s|%(lineno)d:  %(message)s', level=logging.WARNING)
+
+log = logging.getLogger(__name__)
+
+
+def find_new_statements(pdf_dir: Path, user: UserData) -> tuple[list[tuple[Path, str]], list[Path]]:
+    """
+    Split the PDFs in pdf_dir into those still to be ingested, with their content hash, and those already ingested.
+
+    Copies of the same PDF under different names are only ingested once.
+    """
+    pending, skipped = [], []
+    seen = set()
+    for pdf_path in sorted(pdf_dir.glob('*.pdf')):
+        content_hash = file_sha256(pdf_path)
+        if content_hash in seen or user.store.find_statement_by_hash(content_hash):
+            skipped.append(pdf_path)
+        else:
+            seen.add(content_hash)
+            pending.append((pdf_path, content_hash))
+
+    return pending, skipped
+
+
+def split_by_quota(pending: list[tuple[Path, str]], user: UserData) -> tuple[list[tuple[Path, str]], list[tuple[Path, str]]]:
+    """
+    Split the pending statements into those that fit in the chat's quota, in order, and the rest with the reason.
+
+    Done before ingesting anything, so no LLM requests are spent on statements that could never be stored.
+    """
+    accepted, refused = [], []
+    accepted_bytes = 0
+    for pdf_path, content_hash in pending:
+        size = pdf_path.stat().st_size
+        quota_error = user.quota_error(accepted_bytes + size, len(accepted) + 1)
+        if quota_error:
+            refused.append((pdf_path, quota_error))
+        else:
+            accepted.append((pdf_path, content_hash))
+            accepted_bytes += size
+
+    return accepted, refused
+
+
+async def backfill(pdf_dir: Path, user: UserData) -> dict:
+    """
+    Ingest every new statement PDF in pdf_dir into the user's data, printing progress as they finish.
+
+    :return: Counts of the ingested, skipped and failed statements and of the transactions stored
+    """
+    pending, skipped = find_new_statements(pdf_dir, user)
+    pending, refused = split_by_quota(pending, user)
+    print(f'{len(pending)} statements to ingest, {len(skipped)} already ingested')
+    for pdf_path, quota_error in refused:
+        print(f'{pdf_path.name}: not ingested, {quota_error}')
+
+    # statements are categorized one at a time, so merchants categorized for one statement
+    # are found in the merchant index by the next instead of being sent to the LLM again
+    categorize_lock = asyncio.Lock()
+    summary = {'ingested': 0, 'skipped': len(skipped), 'failed': len(refused), 'transactions': 0, 'duplicates': 0}
+
+    async def ingest(pdf_path: Path, content_hash: str):
+        start = time.perf_counter()
+        try:
+            with stage('layout_parse'):
+                rows = await parse_statement_async(pdf_path)
+
+            if rows is None:
+                with stage('pdf_extraction'):
+                    pages = await pdf_to_pages_async(pdf_path)
+                rows = await extract_transactions(pages)
+
+            async with categorize_lock:
+                rows = await categorize_rows(rows, user.merchant_index)
+
+            # the CSVs written by the other statements count towards the quota too
+            quota_error = user.quota_error(pdf_path.stat().st_size)
+            if quota_error:
+                raise RuntimeError(quota_error)
+
+            with stage('csv_write'):
+                save_statement(user, pdf_path, rows, content_hash=content_hash)
+
+        except Exception as e:
+            log.error(f'Failed to ingest {pdf_path.name}: {e}')
+            summary['failed'] += 1
+            result = f'failed: {e}'
+
+        else:
+            summary['ingested'] += 1
+            summary['transactions'] += len(rows)
+            duplicates = len(user.store.duplicates(pdf_path.stem))
+            summary['duplicates'] += duplicates
+            result = f'{len(rows)} transactions' + (f', {duplicates} duplicates skipped' if duplicates else '')
+
+        done = summary['ingested'] + summary['failed'] - len(refused)
+        print(f'[{done}/{len(pending)}] {pdf_path.name}: {result} ({time.perf_counter() - start:.1f}s)')
+
+    with command_context('backfill'):
+        await asyncio.gather(*(ingest(pdf_path, content_hash) for pdf_path, content_hash in pending))
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf_dir', type=Path, help='directory of statement PDFs')
+    parser.add_argument('--chat-id', type=int, required=True, help='Telegram chat the statements belong to')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    summary = asyncio.run(backfill(args.pdf_dir, get_user_data(args.chat_id)))
+
+    print(f"\n{summary['ingested']} ingested ({summary['transactions']} transactions, {summary['duplicates']} duplicates skipped), "
+          f"{summary['skipped']} skipped, {summary['failed']} failed in {time.perf_counter() - start:.1f}s")
+    print(metrics.summary())
+
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Profile the startup imports of the bot with python -X importtime and print the results as JSON.
+
+    python -m benchmarks.import_time --repeat 5 --top 20
+
+Imports the module (main by default) in fresh interpreters, and reports the import time of each
+top-level package and of the slowest modules, and which of the heavy packages that are meant to be
+loaded lazily were imported anyway.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+project_root = Path(__file__).parents[1]
+
+# only loaded once a statement is processed or stats are computed
+LAZY_PACKAGES = ['anthropic', 'numpy', 'pandas', 'pymupdf']
+
+
+def git_commit() -> Optional[str]:
+    # not imported from run_benchmarks, which needs the bot's settings to import
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def import_times(module: str) -> tuple[float, list[dict]]:
+    """
+    Import module in a fresh interpreter.
+
+    :return: Wall time of the import in seconds, and the self and cumulative time of each module it imported
+    """
+    env = {
+        **os.environ,
+        'TELEGRAM_BOT_TOKEN': os.environ.get('TELEGRAM_BOT_TOKEN', 'fake-token'),
+        'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY', 'fake-key'),
+    }
+    code = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=project_root, env=env, capture_output=True, text=True, check=True)
+
+    modules = []
+    for line in result.stderr.splitlines():
+        # e.g. "import time:       291 |     155548 |     httpcore._sync"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append({'module': name.strip(), 'self_s': int(self_us) / 1e6, 'cumulative_s': int(cumulative_us) / 1e6})
+
+    return float(result.stdout.strip().splitlines()[-1]), modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='main', help='module to import')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20, help='number of slowest packages and modules to list')
+    args = parser.parse_args(argv)
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+
+    # the medians over the runs, per top-level package and per module
+    package_runs = defaultdict(list)
+    module_runs = defaultdict(list)
+    for _, modules in runs:
+        packages = defaultdict(float)
+        for m in modules:
+            packages[m['module'].split('.')[0]] += m['self_s']
+            module_runs[m['module']].append(m['cumulative_s'])
+        for package, seconds in packages.items():
+            package_runs[package].append(seconds)
+
+    packages = {package: statistics.median(seconds) for package, seconds in package_runs.items()}
+    modules = {module: statistics.median(seconds) for module, seconds in module_runs.items()}
+    imported = {m['module'] for m in runs[0][1]}
+
+    report = {
+        'commit': git_commit(),
+        'module': args.module,
+        'repeat': args.repeat,
+        'import_median_s': statistics.median(wall for wall, _ in runs),
+        'lazy_packages_imported': [package for package in LAZY_PACKAGES if package in imported],
+        'slowest_packages': dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]),
+        'slowest_modules': dict(sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
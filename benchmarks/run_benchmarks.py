@@ -0,0 +1,173 @@
+"""
+Time the hot paths of the bot on synthetic data and print the results as JSON.
+
+    python -m benchmarks.run_benchmarks --sizes 100 10000 1000000 --output bench.json
+
+Runs entirely offline, no Telegram or Anthropic credentials are needed.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import pandas as pd
+
+from benchmarks.synthetic_data import write_transaction_history, write_uob_statement_pdf
+from src.handlers.stats import analyze_transactions, category_breakdown
+from src.parsers import parse_statement
+from src.utilities.data_utilities import (
+    read_transaction_csvs,
+    remove_uob_disclaimer,
+    rows_to_csv,
+)
+from src.utilities.dataframe_cache import dataframe_cache
+from src.utilities.date_range_index import DateRangeIndex
+from src.utilities.image_utilities import iter_page_texts, pdf_to_text
+from src.utilities.statement_cleaning import clean_statement_pages
+from src.utilities.text_message_utilities import (
+    chunk_html_for_telegram,
+    sort_csv_by_price_to_telegram_html,
+)
+
+
+def time_call(func: Callable, repeat: int, setup: Optional[Callable] = None) -> dict:
+    """Run func repeat times, calling setup (untimed) before each run, and summarize the timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return {
+        'repeat': repeat,
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+        'max_s': max(timings),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_pdf(tmp_dir: Path, n_rows: int, repeat: int) -> list[dict]:
+    pdf_path = tmp_dir / f'statement_{n_rows}.pdf'
+    write_uob_statement_pdf(pdf_path, n_rows)
+
+    raw_pages = list(iter_page_texts(pdf_path))
+    raw_text = ''.join('\n\n' + text for text in raw_pages)
+    _, report = clean_statement_pages(raw_pages)
+
+    return [
+        {'name': 'pdf_to_text', 'size': n_rows,
+         **time_call(lambda: pdf_to_text(pdf_path), repeat)},
+        {'name': 'remove_uob_disclaimer', 'size': n_rows,
+         **time_call(lambda: remove_uob_disclaimer(raw_text), repeat)},
+        {'name': 'clean_statement_pages', 'size': n_rows,
+         'tokens_before': report.tokens_before, 'tokens_after': report.tokens_after,
+         **time_call(lambda: clean_statement_pages(raw_pages), repeat)},
+        {'name': 'parse_statement', 'size': n_rows,
+         **time_call(lambda: parse_statement(pdf_path), repeat)},
+    ]
+
+
+def benchmark_history(tmp_dir: Path, n_rows: int, repeat: int) -> list[dict]:
+    folder = tmp_dir / f'history_{n_rows}'
+    folder.mkdir()
+    write_transaction_history(folder, n_rows)
+
+    results = [
+        {'name': 'read_transaction_csvs', 'size': n_rows,
+         **time_call(lambda: read_transaction_csvs(folder), repeat, setup=dataframe_cache.clear)},
+        {'name': 'read_transaction_csvs (cached)', 'size': n_rows,
+         **time_call(lambda: read_transaction_csvs(folder), repeat)},
+    ]
+
+    df = read_transaction_csvs(folder)
+
+    # the same transactions as float prices and string columns, the way they were held before TRANSACTION_DTYPES
+    legacy_df = pd.DataFrame({
+        'date': df['date'],
+        'name': df['name'].astype(object),
+        'price': df['price_cents'] / 100,
+        'category': df['category'].astype(object),
+    })
+    results.append({'name': 'transactions_memory', 'size': n_rows,
+                    'bytes_before': int(legacy_df.memory_usage(deep=True).sum()),
+                    'bytes_after': int(df.memory_usage(deep=True).sum())})
+    results.append({'name': 'analyze_transactions', 'size': n_rows,
+                    **time_call(lambda: analyze_transactions(df), repeat)})
+
+    # per-category totals of the middle third of the history, by masking the frame and from the index's running totals
+    start, end = (df['date'].quantile(q).date() for q in (1 / 3, 2 / 3))
+    mask_range = lambda: category_breakdown(
+        df.loc[(df['date'] >= pd.Timestamp(start)) & (df['date'] < pd.Timestamp(end) + pd.Timedelta(days=1))])
+    index = DateRangeIndex(df)
+    results.append({'name': 'date_range_index (build)', 'size': n_rows,
+                    'bytes': int(index.starts.nbytes + index.category_dates.nbytes + index.cents.nbytes),
+                    **time_call(lambda: DateRangeIndex(df), repeat)})
+    results.append({'name': 'range category totals (mask)', 'size': n_rows,
+                    **time_call(mask_range, repeat)})
+    results.append({'name': 'range category totals (date_range_index)', 'size': n_rows,
+                    **time_call(lambda: index.category_totals(start, end), repeat)})
+
+    csv_content = rows_to_csv(df.assign(
+        date=df['date'].dt.strftime('%d %b %Y'), price=df['price_cents'] / 100).to_dict('records'))
+    results.append({'name': 'sort_csv_by_price_to_telegram_html', 'size': n_rows,
+                    **time_call(lambda: sort_csv_by_price_to_telegram_html(csv_content), repeat)})
+
+    html_txt = sort_csv_by_price_to_telegram_html(csv_content)
+    results.append({'name': 'chunk_html_for_telegram', 'size': n_rows,
+                    **time_call(lambda: chunk_html_for_telegram(html_txt), repeat)})
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='number of transactions in the synthetic histories')
+    parser.add_argument('--pdf-sizes', type=int, nargs='+', default=[100, 1000],
+                        help='number of transactions in the synthetic statement PDFs')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', type=Path, help='write the JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        for n_rows in args.pdf_sizes:
+            results += benchmark_pdf(tmp_dir, n_rows, args.repeat)
+        for n_rows in args.sizes:
+            results += benchmark_history(tmp_dir, n_rows, args.repeat)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
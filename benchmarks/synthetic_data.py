@@ -0,0 +1,173 @@
+"""
+Generators for synthetic statements and transaction histories, so the hot paths can be benchmarked offline.
+"""
+import csv
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pymupdf
+
+from src.utilities.data_utilities import CSV_COLUMNS
+
+MERCHANTS = [
+    ('NTUC FAIRPRICE', 'Groceries'),
+    ('COLD STORAGE', 'Groceries'),
+    ('SHENG SIONG', 'Groceries'),
+    ('BUS/MRT', 'Transportation'),
+    ('GRAB*RIDES', 'Transportation'),
+    ('GOJEK', 'Transportation'),
+    ('SP DIGITAL', 'Utilities'),
+    ('SINGTEL', 'Utilities'),
+    ('MCDONALDS', 'Dining'),
+    ('KOPITIAM', 'Dining'),
+    ('STARBUCKS', 'Dining'),
+    ('DIN TAI FUNG', 'Dining'),
+    ('SHOPEE SINGAPORE', 'Shopping'),
+    ('LAZADA', 'Shopping'),
+    ('UNIQLO', 'Shopping'),
+    ('AMAZON MARKETPLACE', 'Shopping'),
+    ('SINGAPORE AIRLINES', 'Travel'),
+    ('AGODA', 'Travel'),
+    ('NETFLIX.COM', 'Entertainment'),
+    ('SPOTIFY', 'Entertainment'),
+    ('GUARDIAN', 'Health'),
+    ('WATSONS', 'Health'),
+]
+
+UOB_DISCLAIMER_EN = (
+    "Please note that you are bound by a duty under the rules governing the operation of this account, to check the entries in the above statement. If you do not notify us in writing of any errors,\n"
+    "omissions or unauthorised debits within fourteen (14) days of this statement, the entries above shall be deemed valid, correct, accurate and conclusively binding upon you, and you shall have no\n"
+    "claim against the bank in relation thereto."
+)
+
+UOB_DISCLAIMER_ZH = "请注意，在此户口的管理条规下，您必须核对此结单所列项目，并在十四（1 4 ）天内，以书面通知本行任何错误、遗漏或未经授权支账，否则上述项目当被视为有效、适当和准确并受其约束，您不得向本行索取赔偿."
+
+UOB_FOOTER = "United Overseas Bank Limited   •   80 Raffles Place UOB Plaza Singapore 048624  •  Co. Reg. No. 193500026Z  •  GST Reg. No. MR-8500194-3  •   www.uob.com.sg"
+
+ROWS_PER_PAGE = 35
+
+
+def generate_transactions(n_rows: int, start: date = date(2020, 1, 1), days: int = 0, seed: int = 0) -> list[dict]:
+    """
+    Random transactions with the CSV_COLUMNS keys, sorted by date.
+
+    :param n_rows: Number of transactions
+    :param start: Date of the earliest possible transaction
+    :param days: Number of days the transactions are spread over, by default about 100 transactions a month
+    """
+    rng = random.Random(seed)
+    days = days or max(28, n_rows * 30 // 100)
+
+    rows = []
+    for _ in range(n_rows):
+        name, category = rng.choice(MERCHANTS)
+        if name == 'BUS/MRT':
+            name = f'BUS/MRT {rng.randint(100000000, 999999999)}'
+
+        rows.append({
+            'date': start + timedelta(days=rng.randrange(days)),
+            'name': name,
+            'price': f'{rng.lognormvariate(3, 1):.2f}',
+            'category': category,
+        })
+
+    rows.sort(key=lambda r: r['date'])
+    for row in rows:
+        row['date'] = row['date'].strftime('%d %b %Y')
+    return rows
+
+
+def write_transaction_history(folder: Path, n_rows: int, seed: int = 0) -> list[Path]:
+    """Write n_rows random transactions into one CSV per month, laid out like data_dir."""
+    by_month = defaultdict(list)
+    for row in generate_transactions(n_rows, seed=seed):
+        month = row['date'][3:]  # e.g. 'Jan 2020'
+        by_month[month].append(row)
+
+    paths = []
+    for rows in by_month.values():
+        first = datetime.strptime(rows[0]['date'], '%d %b %Y')
+        path = folder / f'{first:%Y-%m}_synthetic_{first:%Y%m}.csv'
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(rows)
+        paths.append(path)
+
+    return paths
+
+
+def write_uob_statement_pdf(path: Path, n_rows: int, seed: int = 0, statement_date: date = date(2024, 7, 15),
+                            previous_balance: float = 1234.56) -> list[dict]:
+    """
+    Write a PDF laid out like a UOB credit card statement, with ROWS_PER_PAGE transactions per page.
+
+    Every page has the bank header, the column captions and the disclaimer footer. The first page
+    starts with the previous balance, which the sub total includes like on a real statement. The last
+    transaction page ends with the "End of Transaction Details" marker, and is followed by pages that
+    aren't part of the transaction details.
+
+    :return: The transactions in the statement, with the CSV_COLUMNS keys
+    """
+    start = statement_date - timedelta(days=30)
+    rows = generate_transactions(n_rows, start=start, days=30, seed=seed)
+
+    doc = pymupdf.open()
+    total = previous_balance
+
+    pages = [rows[i:i + ROWS_PER_PAGE] for i in range(0, len(rows), ROWS_PER_PAGE)] or [[]]
+    for page_number, page_rows in enumerate(pages, 1):
+        page = doc.new_page(width=595, height=842)
+
+        page.insert_text((40, 40), 'UOB ONE CARD', fontsize=12)
+        page.insert_text((40, 56), 'MR JOHN TAN, 1 EXAMPLE ROAD #01-01, SINGAPORE 123456', fontsize=8)
+        page.insert_text((400, 40), f'Statement Date {statement_date:%d %b %Y}'.upper(), fontsize=8)
+        page.insert_text((400, 56), f'Page {page_number} of {len(pages)}', fontsize=8)
+
+        page.insert_text((40, 90), 'Post', fontsize=8)
+        page.insert_text((90, 90), 'Trans', fontsize=8)
+        page.insert_text((150, 90), 'Description of Transaction', fontsize=8)
+        page.insert_text((470, 90), 'Transaction Amount', fontsize=8)
+        page.insert_text((40, 100), 'Date', fontsize=8)
+        page.insert_text((90, 100), 'Date', fontsize=8)
+        page.insert_text((500, 100), 'SGD', fontsize=8)
+
+        y = 120
+        if page_number == 1:
+            page.insert_text((150, y), 'PREVIOUS BALANCE', fontsize=8)
+            balance_text = f'{previous_balance:,.2f}'
+            page.insert_text((560 - pymupdf.get_text_length(balance_text, fontsize=8), y), balance_text, fontsize=8)
+            y += 14
+
+        for row in page_rows:
+            trans_date = row['date'][:6].upper()
+            page.insert_text((40, y), trans_date, fontsize=8)
+            page.insert_text((90, y), trans_date, fontsize=8)
+            page.insert_text((150, y), row['name'], fontsize=8)
+            amount = f"{float(row['price']):,.2f}"
+            page.insert_text((560 - pymupdf.get_text_length(amount, fontsize=8), y), amount, fontsize=8)
+            total += float(row['price'])
+            y += 14
+
+        if page_number == len(pages):
+            total_text = f'{total:,.2f}'
+            page.insert_text((150, y + 6), 'SUB TOTAL', fontsize=8)
+            page.insert_text((560 - pymupdf.get_text_length(total_text, fontsize=8), y + 6), total_text, fontsize=8)
+            page.insert_text((150, y + 20), 'TOTAL BALANCE FOR UOB ONE CARD', fontsize=8)
+            page.insert_text((150, y + 40), '----- End of Transaction Details -----', fontsize=8)
+            page.insert_text((40, y + 60), 'Please settle the minimum payment by the payment due date.', fontsize=8)
+
+        page.insert_text((20, 740), UOB_DISCLAIMER_EN, fontsize=3)
+        page.insert_text((20, 770), UOB_DISCLAIMER_ZH, fontsize=3, fontname='china-s')
+        page.insert_text((20, 810), UOB_FOOTER, fontsize=5)
+
+    # the pages after the end marker, e.g. rewards summary and payment slip
+    for _ in range(2):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((40, 40), 'UNI$ REWARDS SUMMARY', fontsize=12)
+        page.insert_text((40, 60), 'Please detach and return this payment slip with your cheque.', fontsize=8)
+
+    doc.save(path)
+    return rows
@@ -0,0 +1,319 @@
+"""
+Load test the webhook mode against a local fake Telegram Bot API and print the results as JSON.
+
+    python -m benchmarks.webhook_load --workers 4 --chats 50 --messages 20 --statements 4
+
+Starts the bot with BOT_MODE=webhook pointed at the fake API, posts alternating /help and /data updates from
+many chats to the webhook, and measures how long each reply takes to reach the fake API. Each chat's replies
+must arrive in the order its updates were sent.
+
+Other chats upload a synthetic UOB statement each, which the workers download from the fake API, parse in
+their PDF process pool and categorize with a fake LLM, so the whole ingestion path runs in the worker processes.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import re
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from benchmarks.synthetic_data import write_uob_statement_pdf
+
+project_root = Path(__file__).parents[1]
+
+# fake chat ids, far away from real ones
+FIRST_CHAT_ID = -999_000_000_000
+
+
+class FakeBotAPI:
+    """
+    Answers every Bot API method, recording the messages the bot sends.
+
+    Also serves pdf for every file download, and answers the Anthropic messages API with a
+    categorization of every merchant, as Shopping.
+    """
+
+    def __init__(self, pdf: bytes = b''):
+        self.sent = defaultdict(list)  # chat id -> [(time received, text)]
+        self.edits = defaultdict(list)  # chat id -> [(time received, text)] of edited messages
+        self.pdf = pdf
+        self.lock = threading.Lock()
+        self.message_id = 0
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if not self.path.startswith('/file/'):
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/pdf')
+                self.send_header('Content-Length', str(len(api.pdf)))
+                self.end_headers()
+                self.wfile.write(api.pdf)
+
+            def do_POST(self):
+                method = self.path.rsplit('/', 1)[-1]
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path == '/v1/messages':
+                    self.respond_json(api.categorize(json.loads(body)))
+                    return
+
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    params = json.loads(body or b'{}')
+                else:
+                    params = {k: v[0] for k, v in urllib.parse.parse_qs(body.decode()).items()}
+
+                self.respond(api.handle(method, params))
+
+            def respond(self, result):
+                self.respond_json({'ok': True, 'result': result})
+
+            def respond_json(self, result):
+                payload = json.dumps(result).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.port = self.server.server_address[1]
+
+    def handle(self, method: str, params: dict):
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+
+        if method == 'sendMessage':
+            chat_id = int(params['chat_id'])
+            with self.lock:
+                self.message_id += 1
+                self.sent[chat_id].append((time.perf_counter(), params.get('text', '')))
+                message_id = self.message_id
+
+            return {'message_id': message_id, 'date': int(time.time()),
+                    'chat': {'id': chat_id, 'type': 'private'}, 'text': params.get('text', '')}
+
+        if method == 'editMessageText':
+            with self.lock:
+                self.edits[int(params['chat_id'])].append((time.perf_counter(), params.get('text', '')))
+            return True
+
+        if method == 'getFile':
+            return {'file_id': params['file_id'], 'file_unique_id': params['file_id'],
+                    'file_size': len(self.pdf), 'file_path': f"documents/{params['file_id']}.pdf"}
+
+        return True
+
+    @staticmethod
+    def categorize(request: dict) -> dict:
+        prompt = request['messages'][0]['content']
+        merchants = len(re.findall(r'^\d+\. ', prompt, re.MULTILINE))
+        text = '\n'.join(f'{i},Shopping' for i in range(1, merchants + 1))
+        return {'id': 'msg_fake', 'type': 'message', 'role': 'assistant', 'model': request['model'],
+                'content': [{'type': 'text', 'text': text}], 'stop_reason': 'end_turn', 'stop_sequence': None,
+                'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': len(text) // 4}}
+
+
+def wait_for_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f'nothing listening on port {port}')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def command_update(update_id: int, chat_id: int, command: str) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load'},
+            'text': command,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+        },
+    }
+
+
+def document_update(update_id: int, chat_id: int, file_name: str, file_size: int) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Load'},
+            'document': {'file_id': f'statement{chat_id}', 'file_unique_id': f'statement{chat_id}',
+                         'file_name': file_name, 'mime_type': 'application/pdf', 'file_size': file_size},
+        },
+    }
+
+
+def post_update(url: str, update: dict):
+    request = urllib.request.Request(url, data=json.dumps(update).encode(), headers={'Content-Type': 'application/json'})
+    urllib.request.urlopen(request, timeout=10).close()
+
+
+def statement_result(api: FakeBotAPI, chat_id: int) -> Optional[tuple[float, str]]:
+    """The reply saying whether the statement was stored or why it wasn't, None while it is being processed."""
+    replies = api.sent[chat_id]
+    if replies and replies[0][1] != 'PDF received.':
+        # refused before processing, e.g. as already processed
+        return replies[0]
+    return replies[1] if len(replies) > 1 else None
+
+
+def run_load(workers: int, chats: int, messages: int, statements: int, statement_rows: int, timeout: float) -> dict:
+    # the bot keeps its data in here instead of docker_volume, so it neither leaves files behind
+    # nor resumes the real unfinished ingestion jobs against the fake API
+    tmp_dir = Path(tempfile.mkdtemp(prefix='webhook_load_'))
+    pdf_path = tmp_dir / 'statement.pdf'
+    write_uob_statement_pdf(pdf_path, statement_rows)
+    api = FakeBotAPI(pdf_path.read_bytes())
+
+    chat_ids = [FIRST_CHAT_ID - i for i in range(chats)]
+    statement_chat_ids = [FIRST_CHAT_ID - chats - i for i in range(statements)]
+    threading.Thread(target=api.server.serve_forever, daemon=True).start()
+
+    webhook_port = free_port()
+    env = {
+        **os.environ,
+        'TELEGRAM_BOT_TOKEN': 'fake-token',
+        'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY', 'fake-key'),
+        'BOT_MODE': 'webhook',
+        'WEBHOOK_HOST': '127.0.0.1',
+        'WEBHOOK_PORT': str(webhook_port),
+        'WEBHOOK_WORKERS': str(workers),
+        'WEBHOOK_URL': '',
+        'TELEGRAM_BASE_URL': f'http://127.0.0.1:{api.port}/bot',
+        'TELEGRAM_BASE_FILE_URL': f'http://127.0.0.1:{api.port}/file/bot',
+        'ANTHROPIC_BASE_URL': f'http://127.0.0.1:{api.port}',
+        'METRICS_PORT': '0',
+        'DOCKER_VOLUME_DIR': str(tmp_dir / 'docker_volume'),
+    }
+    bot = subprocess.Popen([sys.executable, '-m', 'main'], cwd=project_root, env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        wait_for_port(webhook_port)
+        url = f'http://127.0.0.1:{webhook_port}/telegram'
+
+        sent = defaultdict(list)  # chat id -> [(time sent, command)]
+        start = time.perf_counter()
+        update_id = 0
+
+        # the statements go first, so they are being processed while the commands are handled
+        uploaded = {}  # chat id -> time sent
+        for chat_id in statement_chat_ids:
+            update_id += 1
+            uploaded[chat_id] = time.perf_counter()
+            post_update(url, document_update(update_id, chat_id, f'statement{-chat_id}.pdf', len(api.pdf)))
+
+        for i in range(messages):
+            command = '/help' if i % 2 == 0 else '/data'
+            for chat_id in chat_ids:
+                update_id += 1
+                sent[chat_id].append((time.perf_counter(), command))
+                post_update(url, command_update(update_id, chat_id, command))
+        post_duration = time.perf_counter() - start
+
+        expected = chats * messages
+
+        def done() -> bool:
+            return (sum(len(api.sent[chat_id]) for chat_id in chat_ids) >= expected
+                    and all(statement_result(api, chat_id) for chat_id in statement_chat_ids))
+
+        deadline = time.monotonic() + timeout
+        while not done() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        duration = time.perf_counter() - start
+
+    finally:
+        bot.terminate()
+        bot.wait(timeout=30)
+        api.server.shutdown()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # /data answers 'no files' for the fake chats, so the order of the replies shows the order the updates were handled in
+    latencies = []
+    in_order = True
+    for chat_id in chat_ids:
+        replies = api.sent[chat_id]
+        reply_commands = ['/data' if text == 'no files' else '/help' for _, text in replies]
+        in_order &= reply_commands == [command for _, command in sent[chat_id]][:len(replies)]
+        latencies += [received - sent_time for (received, _), (sent_time, _) in zip(replies, sent[chat_id])]
+
+    statement_latencies = []
+    statement_errors = []
+    for chat_id in statement_chat_ids:
+        result = statement_result(api, chat_id)
+        if result and result[1].startswith('Analysis complete'):
+            statement_latencies.append(result[0] - uploaded[chat_id])
+        else:
+            # a failed attempt is only shown in the status message while the job waits for its retry
+            edits = [text for _, text in api.edits[chat_id]]
+            statement_errors.append(result[1] if result else (edits[-1] if edits else 'no reply'))
+
+    received = sum(len(api.sent[chat_id]) for chat_id in chat_ids)
+    return {
+        'workers': workers,
+        'chats': chats,
+        'updates': expected,
+        'replies': received,
+        'in_order': in_order,
+        'post_s': post_duration,
+        'duration_s': duration,
+        'updates_per_s': received / duration,
+        'latency_median_s': statistics.median(latencies) if latencies else None,
+        'latency_p95_s': statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else None,
+        'statements': statements,
+        'statements_processed': len(statement_latencies),
+        'statement_latency_median_s': statistics.median(statement_latencies) if statement_latencies else None,
+        'statement_errors': statement_errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--chats', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=10, help='updates sent by each chat')
+    parser.add_argument('--statements', type=int, default=2, help='chats uploading a statement PDF each')
+    parser.add_argument('--statement-rows', type=int, default=40, help='transactions in each statement')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds to wait for the replies')
+    args = parser.parse_args(argv)
+
+    results = [run_load(workers, args.chats, args.messages, args.statements, args.statement_rows, args.timeout)
+               for workers in args.workers]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,27 +1,51 @@
 import logging
+from typing import Optional
 
-import pymupdf
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import (
     Application,
     CallbackContext,
+    CallbackQueryHandler,
     CommandHandler,
     ContextTypes,
     MessageHandler,
     filters,
 )
 
-from src.config.project_paths import cc_statement_dir, data_dir
+from src.config.project_paths import llm_cache_dir
 from src.config.project_secrets import ANTHROPIC_API_KEY, TELEGRAM_BOT_TOKEN
+from src.config.project_settings import (
+    BOT_MODE,
+    METRICS_HOST,
+    METRICS_PORT,
+    TELEGRAM_BASE_FILE_URL,
+    TELEGRAM_BASE_URL,
+    WEBHOOK_WORKERS,
+)
 from src.handlers import help
+from src.handlers.debug import cache_state_command, metrics_command
 from src.handlers.exception_handler import error_handler
 from src.handlers.list_transactions import (
+    list_duplicate_transactions,
+    list_page_callback,
     list_transaction_data_months,
     list_transactions_last_month,
 )
-from src.handlers.process_new_cc_statement import handle_document
-from src.handlers.stats import view_last_month_stats, view_last_statement_stats
+from src.handlers.migrate import migrate_csvs_command
+from src.handlers.process_new_cc_statement import (
+    handle_document,
+    handle_document__images,
+    resume_ingestion_jobs,
+)
+from src.handlers.stats import (
+    compare_periods,
+    view_last_month_stats,
+    view_last_statement_stats,
+    view_range_stats,
+)
+from src.utilities.metrics import instrument, start_metrics_server
+from src.utilities.webhook_server import run_webhook_server
 
 logging.basicConfig(
     format='%(name)s-%(levelname)s|%(lineno)d:  %(message)s', level=logging.INFO)
@@ -29,36 +53,96 @@ logging.basicConfig(
 log = logging.getLogger(__name__)
 
 
-cc_statement_dir.mkdir(parents=True, exist_ok=True)
-data_dir.mkdir(parents=True, exist_ok=True)
+llm_cache_dir.mkdir(parents=True, exist_ok=True)
 
 
-def main():
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+async def post_init(application: Application):
+    metrics_port = application.bot_data.get('metrics_port')
+    if metrics_port:
+        application.bot_data['metrics_server'] = await start_metrics_server(METRICS_HOST, metrics_port)
+
+    # statements that were being processed when the bot last stopped carry on from their last completed stage
+    await resume_ingestion_jobs(application.bot, application.bot_data.get('webhook_shard'))
+
+
+def build_application(webhook_worker: Optional[int] = None) -> Application:
+    """
+    Build the bot with all its handlers.
+
+    :param webhook_worker: Number of the webhook worker process the bot runs in, None when polling
+    """
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .base_url(TELEGRAM_BASE_URL)
+        .base_file_url(TELEGRAM_BASE_FILE_URL)
+        .post_init(post_init)
+    )
+    if webhook_worker is not None:
+        # updates are fed in by the webhook server
+        builder = builder.updater(None)
+
+    application = builder.build()
+    if METRICS_PORT:
+        application.bot_data['metrics_port'] = METRICS_PORT + (webhook_worker or 0)
+    if webhook_worker is not None:
+        application.bot_data['webhook_shard'] = (webhook_worker, WEBHOOK_WORKERS)
+
+    application.add_handler(CommandHandler("start", instrument('start', help.help_command)))
+    application.add_handler(CommandHandler("help", instrument('help', help.help_command)))
+
+    application.add_handler(CommandHandler(
+        "last_month_stats", instrument('last_month_stats', view_last_month_stats)))
+
+    application.add_handler(CommandHandler(
+        "last_statement_stats", instrument('last_statement_stats', view_last_statement_stats)))
 
-    application.add_handler(CommandHandler("start", help.help_command))
-    application.add_handler(CommandHandler("help", help.help_command))
+    application.add_handler(CommandHandler(
+        "stats", instrument('stats', view_range_stats)))
+
+    application.add_handler(CommandHandler(
+        "compare", instrument('compare', compare_periods)))
+
+    application.add_handler(CommandHandler(
+        "data", instrument('data', list_transaction_data_months)))
+
+    application.add_handler(CommandHandler(
+        "list", instrument('list', list_transactions_last_month)))
+
+    application.add_handler(CallbackQueryHandler(
+        instrument('list_page', list_page_callback), pattern=r'^list:'))
 
     application.add_handler(CommandHandler(
-        "last_month_stats", view_last_month_stats))
+        "duplicates", instrument('duplicates', list_duplicate_transactions)))
 
     application.add_handler(CommandHandler(
-        "last_statement_stats", view_last_statement_stats))
+        "migrate", instrument('migrate', migrate_csvs_command)))
 
     application.add_handler(CommandHandler(
-        "data", list_transaction_data_months))
+        "cache_state", instrument('cache_state', cache_state_command)))
 
     application.add_handler(CommandHandler(
-        "list", list_transactions_last_month))
+        "metrics", instrument('metrics', metrics_command)))
 
+    # PDFs captioned "images" are extracted from page images, e.g. scanned statements
     application.add_handler(MessageHandler(
-        filters.Document.PDF, handle_document))
+        filters.Document.PDF & filters.CaptionRegex(r'(?i)\bimages?\b'), instrument('document_images', handle_document__images)))
 
-    # application.add_handler(MessageHandler(
-    #     filters.Document.PDF, handle_document__images))
+    application.add_handler(MessageHandler(
+        filters.Document.PDF, instrument('document', handle_document)))
 
     application.add_error_handler(error_handler)
 
+    return application
+
+
+def main():
+    if BOT_MODE == 'webhook':
+        run_webhook_server(build_application)
+        return
+
+    application = build_application()
+
     log.info('bot started.')
 
     application.run_polling()
@@ -1,7 +1,24 @@
+import os
 from pathlib import Path
 
+from dotenv import load_dotenv
+
 project_root = Path(__file__).parents[2]
 
+env_file = project_root / '.env'
+load_dotenv(env_file)
+
+# all the bot's data lives here, e.g. a temporary directory for the webhook load test
+docker_volume_dir = Path(os.environ.get('DOCKER_VOLUME_DIR') or project_root / 'docker_volume')
+
+# each chat's data is kept under users/<chat id>, laid out like docker_volume itself
+users_dir = docker_volume_dir / 'users'
+
+cc_statement_dir = docker_volume_dir / 'cc_statements'
+data_dir = docker_volume_dir / 'data'
+llm_cache_dir = docker_volume_dir / 'llm_cache'
+merchant_index_path = docker_volume_dir / 'merchant_categories.json'
+transaction_db_path = docker_volume_dir / 'transactions.sqlite3'
 
-cc_statement_dir = project_root / 'docker_volume' / 'cc_statements'
-data_dir = project_root / 'docker_volume' / 'data'
+# ingestion jobs of every chat, so statements interrupted by a restart can be resumed
+ingestion_jobs_db_path = docker_volume_dir / 'ingestion_jobs.sqlite3'
@@ -0,0 +1,81 @@
+import os
+
+from dotenv import load_dotenv
+
+from src.config.project_paths import project_root
+
+env_file = project_root / '.env'
+load_dotenv(env_file)
+
+
+# point the Anthropic clients at another server, e.g. a local fake API when testing the backfill
+ANTHROPIC_BASE_URL = os.environ.get('ANTHROPIC_BASE_URL') or None
+
+LLM_MODEL = os.environ.get('LLM_MODEL', 'claude-3-opus-20240229')
+LLM_MAX_TOKENS = int(os.environ.get('LLM_MAX_TOKENS', 4000))
+
+# statements are split into chunks of at most this many characters, which are extracted in parallel
+LLM_CHUNK_CHARS = int(os.environ.get('LLM_CHUNK_CHARS', 6000))
+
+# extraction results are cached on disk, evicting the least recently used entries above this size
+LLM_CACHE_MAX_BYTES = int(os.environ.get('LLM_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+
+# maximum number of LLM requests in flight at any one time
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 2))
+
+# number of statements processed concurrently, and how many may wait in the queue
+INGESTION_WORKERS = int(os.environ.get('INGESTION_WORKERS', 2))
+INGESTION_QUEUE_SIZE = int(os.environ.get('INGESTION_QUEUE_SIZE', 20))
+
+# failed statements are retried up to INGESTION_MAX_ATTEMPTS times, waiting INGESTION_RETRY_SECONDS, then twice as long each time
+INGESTION_MAX_ATTEMPTS = int(os.environ.get('INGESTION_MAX_ATTEMPTS', 4))
+INGESTION_RETRY_SECONDS = float(os.environ.get('INGESTION_RETRY_SECONDS', 30))
+
+# number of processes used for PDF text extraction and rendering
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', 2))
+
+# statements extracted from images (scanned statements, or uploads captioned "images") are rendered with these settings
+IMAGE_DPI = int(os.environ.get('IMAGE_DPI', 150))
+IMAGE_GRAYSCALE = os.environ.get('IMAGE_GRAYSCALE', 'true').lower() in ('1', 'true', 'yes')
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 75))
+# number of page images sent in each LLM request
+IMAGE_PAGES_PER_REQUEST = int(os.environ.get('IMAGE_PAGES_PER_REQUEST', 4))
+# pages rendered from statements where the end of the transaction details can't be found, e.g. scanned ones, 0 for all
+IMAGE_MAX_PAGES = int(os.environ.get('IMAGE_MAX_PAGES', 8))
+
+# per-chat quotas, 0 for no limit
+USER_MAX_STATEMENTS = int(os.environ.get('USER_MAX_STATEMENTS', 500))
+USER_MAX_STORAGE_BYTES = int(os.environ.get('USER_MAX_STORAGE_BYTES', 500 * 1024 * 1024))
+
+# the chat that keeps using the data stored directly in docker_volume from before it was split by chat,
+# DEVELOPER_CHAT_ID by default. Read here rather than from project_secrets, so the data of a chat can be
+# looked up without the bot's credentials, e.g. by the benchmarks
+LEGACY_DATA_CHAT_ID = os.environ.get('LEGACY_DATA_CHAT_ID') or os.environ.get('DEVELOPER_CHAT_ID') or None
+
+# number of chats whose transaction store and merchant index are kept open
+MAX_OPEN_USERS = int(os.environ.get('MAX_OPEN_USERS', 128))
+
+# number of DataFrames kept in memory by the dataframe cache, least recently used are dropped first
+DATAFRAME_CACHE_ENTRIES = int(os.environ.get('DATAFRAME_CACHE_ENTRIES', 64))
+
+# 'polling' (default) or 'webhook', which serves updates on WEBHOOK_HOST:WEBHOOK_PORT to WEBHOOK_WORKERS
+# processes, sharded by chat so each chat's updates are handled in order by the same process
+BOT_MODE = os.environ.get('BOT_MODE', 'polling')
+WEBHOOK_HOST = os.environ.get('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.environ.get('WEBHOOK_PORT') or 8443)
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/telegram')
+# public URL registered with Telegram on startup, left unset when something else registers the webhook
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL') or None
+WEBHOOK_SECRET_TOKEN = os.environ.get('WEBHOOK_SECRET_TOKEN') or None
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS') or 2)
+# updates waiting for each worker before the webhook answers 503 and Telegram retries later
+WEBHOOK_QUEUE_SIZE = int(os.environ.get('WEBHOOK_QUEUE_SIZE') or 1000)
+
+# point the bot at another Bot API server, e.g. a local fake one for load tests
+TELEGRAM_BASE_URL = os.environ.get('TELEGRAM_BASE_URL') or 'https://api.telegram.org/bot'
+TELEGRAM_BASE_FILE_URL = os.environ.get('TELEGRAM_BASE_FILE_URL') or 'https://api.telegram.org/file/bot'
+
+# the Prometheus metrics endpoint is served on this port when it is set, e.g. 9100.
+# in webhook mode, worker n serves its metrics on METRICS_PORT + n
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT') or 0)
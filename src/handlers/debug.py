@@ -0,0 +1,44 @@
+import html
+import json
+from functools import wraps
+
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.ext import CallbackContext
+
+from src.config.project_secrets import DEVELOPER_CHAT_ID
+from src.llm.extraction_cache import extraction_cache
+from src.utilities.dataframe_cache import dataframe_cache
+from src.utilities.metrics import metrics
+
+
+def developer_only(handler):
+    """Only run the handler for messages from DEVELOPER_CHAT_ID."""
+    @wraps(handler)
+    async def wrapper(update: Update, context: CallbackContext):
+        if not DEVELOPER_CHAT_ID or not update.effective_chat or str(update.effective_chat.id) != str(DEVELOPER_CHAT_ID):
+            return
+        return await handler(update, context)
+
+    return wrapper
+
+
+@developer_only
+async def cache_state_command(update: Update, context: CallbackContext) -> None:
+    """Show the state of the in-memory DataFrame cache and the LLM extraction cache."""
+    assert update.message, 'update.message was None'
+
+    state = {
+        'dataframe_cache': dataframe_cache.state(),
+        'extraction_cache': extraction_cache.stats(),
+    }
+    await update.message.reply_text(f'<pre>{json.dumps(state, indent=2)}</pre>', parse_mode=ParseMode.HTML)
+
+
+@developer_only
+async def metrics_command(update: Update, context: CallbackContext) -> None:
+    """Show the handler latencies and LLM token usage recorded since the bot started."""
+    assert update.message, 'update.message was None'
+
+    await context.bot.send_message(
+        chat_id=DEVELOPER_CHAT_ID, text=f'<pre>{html.escape(metrics.summary())}</pre>', parse_mode=ParseMode.HTML)
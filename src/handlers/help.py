@@ -24,8 +24,12 @@ Commands:
 - /help - Display available commands and instructions
 - /last_month_stats - Show an analysis of last month's expenses and an overview of transactions by month
 - /last_statement_stats - Show an analysis of the last credit card statement's expenses
+- /stats <from> [<to>] - Show an analysis of the expenses between two dates (YYYY, YYYY-MM or YYYY-MM-DD), e.g. /stats 2024-01 2024-03
+- /compare <period> <period> - Compare the expenses of two periods by category, e.g. /compare 2024-05 2024-06, or /compare 2023-01 2023-03 vs 2024-01 2024-03
 - /data - List the months for which expense data is available and processed
-- /list - Display a detailed list of transactions from the last month
+- /list [category] [YYYY-MM] - Page through the transactions of the last statement, or of a given month, optionally only one category
+- /duplicates - List the transactions skipped because an earlier statement already had them
+- /migrate - Import transaction CSVs saved by older versions of the bot
 
 Uploading Statements:
 To add new expense data:
@@ -1,7 +1,9 @@
-import os
+import html
+import re
+from typing import Optional
 
-from telegram import Update
-from telegram.constants import ParseMode
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.constants import MessageLimit, ParseMode
 from telegram.ext import (
     Application,
     CallbackContext,
@@ -11,37 +13,157 @@ from telegram.ext import (
     filters,
 )
 
-from src.config.project_paths import data_dir
-from src.utilities.data_utilities import list_transaction_csvs, sum_prices_from_csv
+from src.utilities.data_utilities import cents_to_price
+from src.utilities.metrics import stage
 from src.utilities.text_message_utilities import (
     chunk_html_for_telegram,
-    sort_csv_by_price_to_telegram_html,
+    transactions_to_telegram_html,
 )
+from src.utilities.transaction_store import TransactionStore
+from src.utilities.user_data import get_update_user_data
+
+
+LIST_PAGE_SIZE = 20
+
+# number of /list views per chat whose next/prev buttons keep working
+MAX_LIST_VIEWS = 20
+
+MONTH_PATTERN = re.compile(r'^\d{4}-\d{2}$')
+
+
+def parse_list_args(args: list[str]) -> dict:
+    """Read the optional YYYY-MM month and category filters of /list, in any order."""
+    view = {'month': None, 'category': None, 'statement': None}
+
+    category_words = []
+    for arg in args:
+        if MONTH_PATTERN.match(arg):
+            view['month'] = arg
+        else:
+            category_words.append(arg)
+
+    if category_words:
+        view['category'] = ' '.join(category_words)
+    return view
+
+
+def render_list_page(store: TransactionStore, view: dict, page: int) -> tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Render one page of a /list view, with the buttons to move to the neighbouring pages."""
+    filters = {k: view[k] for k in ('statement', 'month', 'category')}
+    count, total = store.count_transactions(**filters)
+    if not count:
+        return 'no transactions', None
+
+    pages = (count + LIST_PAGE_SIZE - 1) // LIST_PAGE_SIZE
+    page = max(0, min(page, pages - 1))
+
+    rows = store.transactions_by_price(
+        **filters, offset=page * LIST_PAGE_SIZE, limit=LIST_PAGE_SIZE)
+
+    title = ', '.join(html.escape(v) for v in filters.values() if v)
+    txt = (
+        f'<b>{title}</b>\n'
+        f'{transactions_to_telegram_html(rows, start_index=page * LIST_PAGE_SIZE + 1)}\n'
+        f'Page {page + 1}/{pages}, {count} transactions, Total: ${cents_to_price(total):.2f}'
+    )
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(
+            '< Prev', callback_data=f"list:{view['id']}:{page - 1}"))
+    if page < pages - 1:
+        buttons.append(InlineKeyboardButton(
+            'Next >', callback_data=f"list:{view['id']}:{page + 1}"))
+
+    return txt, InlineKeyboardMarkup([buttons]) if buttons else None
 
 
 async def list_transactions_last_month(update: Update,  context: CallbackContext):
+    """
+    List the transactions of the latest statement, most expensive first, one page at a time.
+
+    /list takes optional filters: a category, and a YYYY-MM month to list that month's transactions
+    across all statements instead.
+    """
     assert update.message, 'update.message was None'
+    assert context.chat_data is not None, 'context.chat_data was None'
+
+    store = get_update_user_data(update).store
+    view = parse_list_args(context.args or [])
+
+    if not view['month']:
+        view['statement'] = store.latest_statement()
+        if not view['statement']:
+            await update.message.reply_text('no files')
+            return
+
+    # the filters are kept in chat_data, as they don't fit in the 64 bytes of callback data
+    view['id'] = context.chat_data.get('next_list_view_id', 0)
+    context.chat_data['next_list_view_id'] = view['id'] + 1
 
-    # Get all CSV files in the folder
-    csv_files = [f for f in os.listdir(data_dir) if f.endswith('.csv')]
+    views = context.chat_data.setdefault('list_views', {})
+    views[view['id']] = view
+    for view_id in list(views)[:-MAX_LIST_VIEWS]:
+        del views[view_id]
 
-    if csv_files:
-        csv_files = [max(csv_files, key=lambda f: f.split('_')[-1])]
+    with stage('rendering'):
+        txt, keyboard = render_list_page(store, view, 0)
+    await update.message.reply_text(txt, parse_mode=ParseMode.HTML, reply_markup=keyboard)
 
-        data = (data_dir / csv_files[0]).read_text()
-        html_txt = sort_csv_by_price_to_telegram_html(data)
 
-        total = sum_prices_from_csv(data)
+async def list_page_callback(update: Update, context: CallbackContext):
+    """Show another page of a /list view when one of its buttons is pressed."""
+    query = update.callback_query
+    assert query and query.data, 'update.callback_query was None'
+    await query.answer()
 
-        for i in chunk_html_for_telegram(html_txt):
-            await update.message.reply_text(i, parse_mode=ParseMode.HTML)
-        await update.message.reply_text(f'Total: ${total:.2f}')
-    else:
-        await update.message.reply_text('no files')
+    _, view_id, page = query.data.split(':')
+    view = (context.chat_data or {}).get('list_views', {}).get(int(view_id))
+    if view is None:
+        await query.edit_message_text('This list has expired, send /list again.')
+        return
+
+    with stage('rendering'):
+        txt, keyboard = render_list_page(get_update_user_data(update).store, view, int(page))
+    await query.edit_message_text(txt, parse_mode=ParseMode.HTML, reply_markup=keyboard)
+
+
+def statement_summary(s: dict) -> str:
+    # a statement whose transactions were all stored from other statements has no rows, and so no period
+    if not s['row_count']:
+        return f"{s['statement']}: no new transactions"
+    return f"{s['statement']}: {s['period_start']} to {s['period_end']}, {s['row_count']} transactions, ${cents_to_price(s['total_cents']):.2f}"
 
 
 async def list_transaction_data_months(update: Update, context):
     assert update.message, 'update.message was None'
 
-    txt = '\n'.join([i.split('_')[0] for i in list_transaction_csvs()])
-    await update.message.reply_text(txt)
+    txt = '\n'.join(statement_summary(s) for s in get_update_user_data(update).store.statements())
+    await update.message.reply_text(txt or 'no files')
+
+
+# rows shown by /duplicates, so a long history doesn't flood the chat
+MAX_DUPLICATES_SHOWN = 50
+
+
+async def list_duplicate_transactions(update: Update, context: CallbackContext):
+    """List the transactions that were dropped at ingest because an earlier statement already had them."""
+    assert update.message, 'update.message was None'
+
+    duplicates = get_update_user_data(update).store.duplicates()
+    if not duplicates:
+        await update.message.reply_text('no duplicate transactions')
+        return
+
+    lines = [
+        f"{d['statement']}: {d['date']} {d['name']} ${cents_to_price(d['price_cents']):.2f} (already in {d['duplicate_of']})"
+        for d in duplicates[-MAX_DUPLICATES_SHOWN:]
+    ]
+    if len(duplicates) > MAX_DUPLICATES_SHOWN:
+        lines.insert(0, f'Last {MAX_DUPLICATES_SHOWN} of {len(duplicates)}:')
+    lines += ['', f'{len(duplicates)} duplicates, ${cents_to_price(sum(d["price_cents"] for d in duplicates)):.2f} not counted twice']
+
+    # split over as many messages as needed, leaving room for the <pre> tags each one is wrapped in
+    char_limit = MessageLimit.MAX_TEXT_LENGTH - len('<pre>\n\n</pre>')
+    for chunk in chunk_html_for_telegram(html.escape('\n'.join(lines)), char_limit=char_limit):
+        await update.message.reply_text(chunk, parse_mode=ParseMode.HTML)
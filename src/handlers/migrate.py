@@ -0,0 +1,15 @@
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from src.utilities.user_data import get_update_user_data
+
+
+async def migrate_csvs_command(update: Update, context: CallbackContext) -> None:
+    """Import the transaction CSVs in the chat's data_dir into its transaction store. Safe to run more than once."""
+    assert update.message, 'update.message was None'
+
+    user = get_update_user_data(update)
+    imported = user.store.import_csvs(user.data_dir, user.cc_statement_dir)
+
+    rows = sum(imported.values())
+    await update.message.reply_text(f'Imported {rows} transactions from {len(imported)} CSV files.')
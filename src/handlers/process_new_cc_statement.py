@@ -1,12 +1,16 @@
+import asyncio
+import csv
 import logging
 import os
+import time
 from datetime import datetime
-from functools import wraps
+from functools import partial, wraps
+from pathlib import Path
 from typing import Any, Callable, Optional
 
-from anthropic import APIError
-from telegram import Message, Update
+from telegram import Bot, Message, Update
 from telegram.constants import ParseMode
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
     CallbackContext,
@@ -16,144 +20,311 @@ from telegram.ext import (
     filters,
 )
 
-from src.config.project_paths import cc_statement_dir, data_dir
-from src.llm import llm_client
-from src.utilities.image_utilities import pdf_to_images, pdf_to_text
+from src.config.project_settings import (
+    INGESTION_MAX_ATTEMPTS,
+    INGESTION_QUEUE_SIZE,
+    INGESTION_RETRY_SECONDS,
+    INGESTION_WORKERS,
+)
+from src.llm.anthropic import is_api_error
+from src.llm.categorization import categorize_rows
+from src.llm.extraction import (
+    extract_transactions,
+    extract_transactions_from_images,
+)
+from src.parsers import parse_statement_async
+from src.utilities.data_utilities import CSV_COLUMNS, file_sha256, rows_to_csv
+from src.utilities.image_utilities import pdf_to_images_async, pdf_to_pages_async
+from src.utilities.ingestion_jobs import IngestionJob, ingestion_jobs, retry_delay
+from src.utilities.job_queue import JobQueue
+from src.utilities.metrics import command_context, stage
+from src.utilities.status_message import StatusMessage
+from src.utilities.user_data import UserData, get_update_user_data, get_user_data
 
 log = logging.getLogger(__name__)
 
 
-async def handle_document(update: Update, context):
+ingestion_queue = JobQueue(INGESTION_WORKERS, maxsize=INGESTION_QUEUE_SIZE)
+
+# keys of the jobs this process is working on, whether queued, running or waiting for a retry.
+# A chat's jobs are only ever run by the one process its updates go to
+active_jobs: set[tuple[int, str]] = set()
+
+
+async def handle_document(update: Update, context, use_images: bool = False):
     assert update.message, 'update.message is None'
     assert update.message.document, 'update.message.document is None'
     assert update.message.document.file_name, 'update.message.document.file_name is None'
 
-    # Get the file
-    file = await context.bot.get_file(update.message.document.file_id)
+    document = update.message.document
+    user = get_update_user_data(update)
+
+    # Telegram can deliver the same upload twice, and users re-send statements, so jobs are keyed by the file
+    job = ingestion_jobs.get(user.chat_id, document.file_unique_id)
+    if job and job.key in active_jobs:
+        await update.message.reply_text('This statement is already being processed.')
+        return
+
+    # a statement extracted from its text is extracted again when it is sent with the "images" caption,
+    # e.g. because its text gave junk rows
+    switch_to_images = use_images and not (job and job.use_images)
+    if job and job.done and not switch_to_images:
+        await update.message.reply_text(
+            'This statement has already been processed. Send it with the caption "images" to extract it '
+            'from images of its pages instead.')
+        return
+
+    if job:
+        job.file_id = document.file_id
+        job.message_id = update.message.message_id
+        job.use_images = use_images
+        if switch_to_images:
+            # the rows stored from the text extraction, if any, are replaced once the job is written again
+            job = ingestion_jobs.restart(job)
+            partial_csv_path(user, job.file_name).unlink(missing_ok=True)
+        else:
+            # a statement that failed, or that was left unfinished and isn't being worked on (e.g. its resume
+            # failed), is retried from the last stage it completed when it is sent again
+            job = ingestion_jobs.reset(job)
+    else:
+        quota_error = user.quota_error(document.file_size or 0)
+        if quota_error:
+            await update.message.reply_text(quota_error)
+            return
+
+        job, _ = ingestion_jobs.create(IngestionJob(
+            chat_id=user.chat_id,
+            file_unique_id=document.file_unique_id,
+            file_id=document.file_id,
+            file_name=Path(document.file_name).name,
+            message_id=update.message.message_id,
+            use_images=use_images,
+        ))
+
+    status_message = await update.message.reply_text('PDF received.')
+
+    # the LLM call can take minutes, so it runs on the ingestion queue instead of blocking this handler
+    try:
+        position = submit_job(context.bot, job, status_message)
+    except asyncio.QueueFull:
+        ingestion_jobs.give_up(job, 'ingestion queue full')
+        await status_message.edit_text('PDF received, but too many statements are being processed right now. Please send it again later.')
+        return
 
-    pdf_path = cc_statement_dir / f'{update.message.document.file_name}'
-    await file.download_to_drive(pdf_path)
+    if position:
+        await status_message.edit_text(f'PDF received. Queued for analysis at position {position}.')
 
-    await update.message.reply_text('PDF received and saved. Analyzing...')
 
-    current_year = datetime.now().strftime("%Y")
+async def handle_document__images(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle a PDF uploaded with an "images" caption, extracting it from page images instead of its text."""
+    await handle_document(update, context, use_images=True)
 
-    cleaned_text = pdf_to_text(pdf_path)
 
-    # Send to Claude API
-    prompt = """
-Help me categorize each transaction in this credit card statement into a csv table.
-Use the columns date, name, price, category.
-For BUS/MRT transactions, truncate the id at the end of the transaction name.
-Make sure that the result is a valid csv with a transaction on each row.
-Here's the credit card statement:
+def submit_job(bot: Bot, job: IngestionJob, status_message: Message) -> int:
+    """
+    Queue a job on the ingestion queue.
 
-{statement}
+    :return: The job's position in the queue, see JobQueue.submit
+    :raises asyncio.QueueFull: If the queue is full
+    """
+    position = ingestion_queue.submit(partial(process_statement, bot, job, status_message))
+    active_jobs.add(job.key)
+    return position
 
-Please provide the categorized transactions in CSV format.
-"""
 
-    prompt += f'Format the date as %d %b %Y. If the year is missing, use {current_year}.'
-    prompt += f"Don't start the response with a message like 'This was generated by AI'. Only output the csv and nothing else. "
+def retry_later(bot: Bot, job: IngestionJob, status_message: Message):
+    """Queue a job once its next_attempt_at has passed."""
+    delay = max(0.0, (job.next_attempt_at or 0) - time.time())
+    asyncio.get_running_loop().call_later(delay, _resubmit_job, bot, job, status_message)
+    active_jobs.add(job.key)
 
-    log.info('Querying Claude')
 
+def _resubmit_job(bot: Bot, job: IngestionJob, status_message: Message):
+    try:
+        submit_job(bot, job, status_message)
+    except asyncio.QueueFull:
+        # waiting for room in the queue doesn't use up one of the job's attempts
+        job.next_attempt_at = time.time() + INGESTION_RETRY_SECONDS
+        retry_later(bot, job, status_message)
+
+
+async def resume_ingestion_jobs(bot: Bot, shard: Optional[tuple[int, int]] = None) -> int:
+    """
+    Queue the jobs left unfinished by the last run, e.g. statements that were being processed when the bot restarted.
+
+    :param shard: (worker, number of workers) of a webhook worker, to only resume the jobs of the chats sent to it
+    :return: Number of jobs resumed
+    """
+    jobs = ingestion_jobs.unfinished()
+    if shard:
+        worker, workers = shard
+        jobs = [job for job in jobs if job.chat_id % workers == worker]
+
+    for job in jobs:
+        try:
+            status_message = await bot.send_message(
+                job.chat_id, f'Resuming the analysis of {job.file_name}.',
+                reply_to_message_id=job.message_id, allow_sending_without_reply=True)
+        except TelegramError as e:
+            # left unfinished, so it is tried again on the next start
+            log.warning(f'Failed to resume job {job.file_unique_id} of chat {job.chat_id}: {e}')
+            continue
+
+        retry_later(bot, job, status_message)
+
+    if jobs:
+        log.info(f'resumed {len(jobs)} ingestion jobs')
+    return len(jobs)
+
+
+async def process_statement(bot: Bot, job: IngestionJob, status_message: Message):
+    # runs on the ingestion queue's workers, outside of the handler that submitted it
     try:
-        message = llm_client.messages.create(
-            model="claude-3-opus-20240229",
-            max_tokens=4000,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt.format(statement=cleaned_text)
-                }
-            ]
-        )
-
-        # Save Claude's response to a CSV file
-        csv_path = data_dir / \
-            f'{os.path.splitext(update.message.document.file_name)[0]}.csv'
-
-        with open(csv_path, 'w', newline='') as csv_file:
-            csv_file.write(message.content[0].text)  # type: ignore
-
-        if message.stop_reason == 'max_tokens':
-            max_token_exceeded_message = 'Warning: CC statement was too large, CSV data was truncated.'
-            log.warning(max_token_exceeded_message)
-            await update.message.reply_text(max_token_exceeded_message)
-
-        await update.message.reply_text('Analysis complete. CSV file saved.')
-
-    except APIError as e:
-        log.error(f"API error occurred: {e}")
-        await update.message.reply_text(f"API error occurred: {e}")
+        with command_context('process_statement'), stage('total'):
+            await _process_statement(bot, get_user_data(job.chat_id), job, status_message)
+    finally:
+        # written, given up on, or scheduled for a retry, which keeps it active
+        if job.next_attempt_at is None:
+            active_jobs.discard(job.key)
 
-    except Exception as e:
-        log.error(f"An unexpected error occurred: {e}")
-        await update.message.reply_text(f"An unexpected error occurred: {e}")
 
+async def _process_statement(bot: Bot, user: UserData, job: IngestionJob, status_message: Message):
+    """Run the job's remaining stages, recording each one in the job table as soon as it is done."""
+    status = StatusMessage(status_message)
+    await status.update('PDF received. Analyzing...', force=True)
 
-async def handle_document__images(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    raise NotImplementedError
+    pdf_path = user.cc_statement_dir / job.file_name
+    use_images = job.use_images
 
-    assert update.message, 'update.message was None'
-    assert update.message.document, 'update.message.document was None'
+    # rows are appended here as they are extracted, so a failed extraction still leaves data behind
+    partial_path = partial_csv_path(user, job.file_name)
+    saved_rows = count_csv_rows(partial_path)
+    rows_found = 0
 
-    file = await context.bot.get_file(update.message.document.file_id)
+    try:
+        if job.state == 'received':
+            with stage('download'):
+                file = await bot.get_file(job.file_id)
+                await file.download_to_drive(pdf_path)
+            job = ingestion_jobs.advance(job, 'downloaded')
+
+        if job.state == 'downloaded':
+            rows = None
+            if not use_images:
+                # statements in a known bank layout are parsed straight from the PDF, the rest go through the LLM
+                with stage('layout_parse'):
+                    rows = await parse_statement_async(pdf_path)
+
+            if rows is None and not use_images:
+                with stage('pdf_extraction'):
+                    pages = await pdf_to_pages_async(pdf_path)
+
+                # scanned statements have no text layer, so they can only be read from images of the pages
+                if not any(page.strip() for page in pages):
+                    log.info(f'No text found in {pdf_path.name}, extracting it from page images')
+                    use_images = True
+
+            if rows is None:
+                with open(partial_path, 'a', newline='') as partial_csv_file:
+                    writer = csv.DictWriter(
+                        partial_csv_file, fieldnames=CSV_COLUMNS, lineterminator='\n')
+                    if partial_csv_file.tell() == 0:
+                        writer.writeheader()
+
+                    async def on_row(row: dict):
+                        nonlocal rows_found
+                        rows_found += 1
+                        # a retry extracts the statement from the start again, so it only adds the rows after
+                        # those saved by the earlier attempts
+                        if rows_found > saved_rows:
+                            writer.writerow(row)
+                            partial_csv_file.flush()
+
+                        await status.update(f'Analyzing... {rows_found} transactions found so far.')
+
+                    if use_images:
+                        with stage('pdf_render'):
+                            images = await pdf_to_images_async(pdf_path)
+                        rows = await extract_transactions_from_images(images, on_row=on_row)
+                    else:
+                        rows = await extract_transactions(pages, on_row=on_row)
+
+            job = ingestion_jobs.advance(job, 'extracted', rows)
+
+        if job.state == 'extracted':
+            assert job.rows is not None, 'extracted job has no rows'
+            job = ingestion_jobs.advance(job, 'llm_done', await categorize_rows(job.rows, user.merchant_index))
+
+        assert job.rows is not None, 'categorized job has no rows'
+        row_count = len(job.rows)
+
+        with stage('csv_write'):
+            save_statement(user, pdf_path, job.rows)
+            partial_path.unlink(missing_ok=True)
+        job = ingestion_jobs.advance(job, 'written')
+
+        await reply(bot, job, f'Analysis complete. CSV file saved with {row_count} transactions.'
+                              f'{duplicates_note(len(user.store.duplicates(pdf_path.stem)))}')
 
-    pdf_path = cc_statement_dir / f'{update.message.document.file_name}'
-    await file.download_to_drive(pdf_path)
+    except Exception as e:
+        error = f"API error occurred: {e}" if is_api_error(e) else f"An unexpected error occurred: {e}"
+        await retry_or_give_up(bot, job, status_message, error, partial_rows_note(max(rows_found, saved_rows), partial_path))
 
-    await update.message.reply_text('PDF received. Converting to images...')
 
-    # Convert PDF to images
-    image_files = pdf_to_images(pdf_path)
+async def retry_or_give_up(bot: Bot, job: IngestionJob, status_message: Message, error: str, note: str = ''):
+    """Record a failed attempt at a job, and either schedule its retry or tell the user it failed."""
+    log.error(f'job {job.file_unique_id} of chat {job.chat_id} failed in state {job.state}: {error}')
 
-    if not image_files:
-        await update.message.reply_text('Error converting PDF to images. Please try again with a different PDF.')
+    job = ingestion_jobs.record_failure(job, error)
+    if job.failed:
+        await reply(bot, job, f'{error}{note}')
         return
 
-    await update.message.reply_text('Analyzing images...')
-
-    # Prepare the message content
-    content = [
-        {
-            "type": "text",
-            "text": """Help me categorize each transaction in this credit card statement into a csv table.
-Use the columns date, name, price, category. For BUS/MRT transactions, truncate the id at the end of the transaction name.
-Make sure that the result is a valid csv with a transaction on each row. Remove any reference numbers (Ref No).
-The statement is provided in the following image(s):"""
-        }
-    ]
-
-    # Add each image to the content
-    for i, image_file in enumerate(image_files):
-        content.append({
-            "type": "image",
-            "source": {
-                "type": "base64",
-                "media_type": "image/png",
-                "data": base64.b64encode(image_file.getvalue()).decode()
-            }
-        })
-
-    log.info('Querying Claude')
-
-    message = llm_client.messages.create(
-        model="claude-3-opus-20240229",
-        max_tokens=2000,
-        messages=[
-            {
-                "role": "user",
-                "content": content
-            }
-        ]
-    )
-
-    # Save Claude's response to a CSV file
-    csv_path = data_dir / \
-        f'{os.path.splitext(update.message.document.file_name)[0]}.csv'
-    with open(csv_path, 'w', newline='') as csv_file:
-        csv_file.write(message.content[0].text)
-
-    await update.message.reply_text('Analysis complete. CSV file saved.')
+    await StatusMessage(status_message).update(
+        f'{error}\nRetrying in {retry_delay(job.attempts):.0f} seconds '
+        f'(attempt {job.attempts + 1} of {INGESTION_MAX_ATTEMPTS}).', force=True)
+    retry_later(bot, job, status_message)
+
+
+async def reply(bot: Bot, job: IngestionJob, text: str):
+    """Reply to the upload of a job, which may be long gone if the job was resumed."""
+    await bot.send_message(
+        job.chat_id, text, reply_to_message_id=job.message_id, allow_sending_without_reply=True)
+
+
+def save_statement(user: UserData, pdf_path: Path, rows: list[dict], content_hash: Optional[str] = None) -> Path:
+    """
+    Write the categorized transactions of a statement to its CSV in the user's data_dir, and add them to their transaction store.
+
+    :return: Path of the CSV
+    """
+    csv_path = user.data_dir / f'{pdf_path.stem}.csv'
+    csv_path.write_text(rows_to_csv(rows))
+    user.store.add_statement(
+        csv_path.stem, rows, source_pdf=pdf_path, csv_path=csv_path,
+        content_hash=content_hash or file_sha256(pdf_path))
+    return csv_path
+
+
+def duplicates_note(duplicates: int) -> str:
+    if not duplicates:
+        return ''
+    return f'\n{duplicates} of them were already stored from other statements and were skipped, see /duplicates.'
+
+
+def partial_csv_path(user: UserData, file_name: str) -> Path:
+    """Where the rows of a statement are saved while it is extracted, until its CSV is written."""
+    return user.data_dir / f'{Path(file_name).stem}.csv.partial'
+
+
+def count_csv_rows(csv_path: Path) -> int:
+    if not csv_path.exists():
+        return 0
+    with open(csv_path, newline='') as csv_file:
+        return sum(1 for _ in csv.DictReader(csv_file))
+
+
+def partial_rows_note(rows_found: int, partial_csv_path: Path) -> str:
+    if not rows_found:
+        return ''
+    return f'\n{rows_found} transactions extracted before the error were saved to {partial_csv_path.name}.'
@@ -1,13 +1,14 @@
 import logging
-import os
 from datetime import timedelta
 
-import pandas as pd
 from telegram import Update
 
-from src.config.project_paths import data_dir
-from src.utilities.data_utilities import read_transaction_csvs
+from src.utilities.data_utilities import cents_to_price
+from src.utilities.date_range_index import DateRangeIndex, parse_period
+from src.utilities.metrics import stage
 from src.utilities.text_message_utilities import format_nested_dict
+from src.utilities.transaction_store import TransactionStore
+from src.utilities.user_data import get_update_user_data
 
 log = logging.getLogger(__name__)
 
@@ -15,50 +16,116 @@ log = logging.getLogger(__name__)
 async def view_last_statement_stats(update: Update, context):
     assert update.message, 'update.message is None'
 
-    df = read_transaction_csvs(data_dir, latest_only=True)
+    store = get_update_user_data(update).store
+    df = store.read_transactions(latest_only=True)
+    if df is None:
+        await update.message.reply_text('no transactions')
+        return
 
-    analysis = analyze_transactions(df)
-    txt = format_nested_dict(analysis)
+    with stage('analytics'):
+        analysis = analyze_transactions(df)
+    with stage('rendering'):
+        txt = format_nested_dict(analysis)
     await update.message.reply_text(txt)
 
 
 async def view_last_month_stats(update: Update, context):
     assert update.message, 'update.message is None'
 
-    df = read_transaction_csvs(data_dir)
+    store = get_update_user_data(update).store
+    if store.last_date() is None:
+        await update.message.reply_text('no transactions')
+        return
 
-    analysis = analyze_transactions(df)
-    txt = format_nested_dict(analysis)
+    with stage('analytics'):
+        analysis = analyze_monthly_rollups(store)
+    with stage('rendering'):
+        txt = format_nested_dict(analysis)
     await update.message.reply_text(txt)
 
 
+STATS_USAGE = 'Usage: /stats <from> [<to>], with dates as YYYY, YYYY-MM or YYYY-MM-DD, e.g. /stats 2024-01 2024-03'
+COMPARE_USAGE = ('Usage: /compare <period> <period>, or /compare <from> <to> vs <from> <to>, '
+                 'with dates as YYYY, YYYY-MM or YYYY-MM-DD, e.g. /compare 2024-05 2024-06')
+
+
+async def view_range_stats(update: Update, context):
+    """Show an analysis of the transactions between two dates, e.g. /stats 2024-01 2024-03."""
+    assert update.message, 'update.message is None'
+
+    try:
+        start, end = parse_period(context.args or [])
+    except ValueError as e:
+        await update.message.reply_text(f'{e}\n{STATS_USAGE}')
+        return
+
+    index = get_update_user_data(update).store.date_range_index()
+    if index is None:
+        await update.message.reply_text('no transactions')
+        return
+
+    with stage('analytics'):
+        analysis = analyze_range(index, start, end)
+    with stage('rendering'):
+        txt = format_nested_dict(analysis)
+    await update.message.reply_text(txt)
+
+
+async def compare_periods(update: Update, context):
+    """Show the spending of two periods side by side, e.g. /compare 2024-05 2024-06."""
+    assert update.message, 'update.message is None'
+
+    try:
+        first, second = split_compare_args(context.args or [])
+        first_period, second_period = parse_period(first), parse_period(second)
+    except ValueError as e:
+        await update.message.reply_text(f'{e}\n{COMPARE_USAGE}')
+        return
+
+    index = get_update_user_data(update).store.date_range_index()
+    if index is None:
+        await update.message.reply_text('no transactions')
+        return
+
+    with stage('analytics'):
+        comparison = compare_ranges(index, first_period, second_period)
+    with stage('rendering'):
+        txt = format_nested_dict(comparison)
+    await update.message.reply_text(txt)
+
+
+ESSENTIAL_CATEGORIES = ['Groceries', 'Utilities',
+                        'Rent', 'Transportation']  # Add more as needed
+
+
 def monthly_spending_overview(df):
     monthly_spending = df.groupby(df['date'].dt.to_period('M'))[
-        'price'].sum().to_dict()
-    return {str(k): float(v) for k, v in monthly_spending.items()}
+        'price_cents'].sum().to_dict()
+    return {str(k): cents_to_price(v) for k, v in monthly_spending.items()}
 
 
-def category_breakdown(df, start_date, end_date):
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    category_totals = df.loc[mask].groupby('category')['price'].sum().to_dict()
-    return {k: float(v) for k, v in category_totals.items()}
+def merchant_summary(window):
+    """Total and mean (in cents) and count of each merchant's transactions, in a single groupby over the window."""
+    return window.groupby('name', observed=True).agg(
+        total=('price_cents', 'sum'),
+        mean=('price_cents', 'mean'),
+        count=('date', 'count'),
+    )
 
 
-def top_merchants(df, start_date, end_date, top_n=10):
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    merchant_totals = df.loc[mask].groupby(
-        'name')['price'].sum().nlargest(top_n).to_dict()
-    return {k: float(v) for k, v in merchant_totals.items()}
+def category_breakdown(window):
+    category_totals = window.groupby('category', observed=True)['price_cents'].sum().to_dict()
+    return {k: cents_to_price(v) for k, v in category_totals.items()}
 
 
-def recurring_expenses(df, start_date, end_date, threshold=2):
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    recurring = df.loc[mask].groupby('name').agg({
-        'price': 'mean',
-        'date': 'count'
-    })
-    recurring = recurring[recurring['date'] >= threshold]
-    return recurring['price'].to_dict()
+def top_merchants(merchants, top_n=10):
+    merchant_totals = merchants['total'].nlargest(top_n).to_dict()
+    return {k: cents_to_price(v) for k, v in merchant_totals.items()}
+
+
+def recurring_expenses(merchants, threshold=2):
+    recurring = merchants[merchants['count'] >= threshold]
+    return {k: v / 100 for k, v in recurring['mean'].to_dict().items()}
 
 # should be output by LLM analysis
 # def unusual_spending_alerts(df, start_date, end_date, threshold=2):
@@ -71,54 +138,34 @@ def recurring_expenses(df, start_date, end_date, threshold=2):
 #     return unusual.to_dict()
 
 
-def discretionary_vs_essential_spending(df, start_date, end_date, essential_categories):
-    mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-    spending = df.loc[mask]
+def discretionary_vs_essential_spending(window, essential_categories):
+    is_essential = window['category'].isin(essential_categories)
 
-    essential = spending[spending['category'].isin(
-        essential_categories)]['price'].sum()
-    discretionary = spending[~spending['category'].isin(
-        essential_categories)]['price'].sum()
+    essential = window.loc[is_essential, 'price_cents'].sum()
+    discretionary = window.loc[~is_essential, 'price_cents'].sum()
 
     return {
-        'essential': float(essential),
-        'discretionary': float(discretionary)
+        'essential': cents_to_price(essential),
+        'discretionary': cents_to_price(discretionary)
     }
 
 
 def get_sum_of_top_x_transactions(df, x: int = 20, step: int = 5):
-    result = {}
-
-    for i in range(5, x, step):
-        result[f'{i}'] = return_top_n_sum(df, i)
-
-    return result
-
-
-def return_top_n_sum(df, n=5):
     """
-    Display the  combined price for the top-N items from the csv df.
+    Combined price of the top-N transactions for N = 5, 10, ... up to (excluding) x.
 
-    Parameters:
-    df (pd.DataFrame): DataFrame with columns: date, name, price, category
-    n (int): Number of top items to display (default is 5)
-
-    Returns:
-    None (prints the results)
+    The prices are sorted once, and each sum is read off a running total of the sorted integer cents,
+    which is exact, unlike a running total of float prices.
     """
-    # Ensure the price column is numeric
-    df['price'] = pd.to_numeric(df['price'], errors='coerce')
-
-    # Sort the DataFrame by price in descending order
-    sorted_df = df.sort_values('price', ascending=False)
+    import numpy as np
 
-    # Get the top N items
-    top_n = sorted_df.head(n)
+    totals = np.cumsum(np.sort(df['price_cents'].to_numpy())[::-1])
 
-    # Calculate the combined price
-    combined_price = top_n['price'].sum()
+    result = {}
+    for i in range(5, x, step):
+        result[f'{i}'] = cents_to_price(totals[min(i, len(totals)) - 1]) if len(totals) else 0.0
 
-    return combined_price
+    return result
 
 
 def analyze_transactions(df):
@@ -126,17 +173,143 @@ def analyze_transactions(df):
     start_of_last_month = last_date.replace(day=1) - timedelta(days=1)
     start_of_last_month = start_of_last_month.replace(day=1)
 
-    essential_categories = ['Groceries', 'Utilities',
-                            'Rent', 'Transportation']  # Add more as needed
+    # slice the last month once, and share the per-merchant groupby between the breakdowns that need it.
+    # df is sorted by date and the window ends at its last transaction, so one binary search finds it
+    window = df.iloc[df['date'].searchsorted(start_of_last_month):]
+    merchants = merchant_summary(window)
 
     return {
         'monthly_overview': monthly_spending_overview(df),
         'last_month': {
-            'category_breakdown': category_breakdown(df, start_of_last_month, last_date),
-            'top_merchants': top_merchants(df, start_of_last_month, last_date),
-            'recurring_expenses': recurring_expenses(df, start_of_last_month, last_date),
+            'category_breakdown': category_breakdown(window),
+            'top_merchants': top_merchants(merchants),
+            'recurring_expenses': recurring_expenses(merchants),
             # 'unusual_spending': unusual_spending_alerts(df, start_of_last_month, last_date),
-            'discretionary_vs_essential': discretionary_vs_essential_spending(df, start_of_last_month, last_date, essential_categories),
+            'discretionary_vs_essential': discretionary_vs_essential_spending(window, ESSENTIAL_CATEGORIES),
             'Combined_Value_of_top_N_transactions': get_sum_of_top_x_transactions(df),
         }
     }
+
+
+def previous_month(month: str) -> str:
+    """Month before a YYYY-MM month, in the same format."""
+    year, mon = map(int, month.split('-'))
+    if mon == 1:
+        return f'{year - 1}-12'
+    return f'{year}-{mon - 1:02d}'
+
+
+def analyze_monthly_rollups(store: TransactionStore):
+    """
+    Same analysis as analyze_transactions, read from the store's monthly rollups instead of the raw rows.
+
+    The last-month window of analyze_transactions always covers exactly two calendar months (the month
+    of the latest transaction and the one before it), so it can be answered from whole-month rollups.
+    """
+    last_month = str(store.last_date())[:7]
+    months = [previous_month(last_month), last_month]
+
+    categories = store.category_totals(months)
+    merchants = store.merchant_totals(months)
+
+    # sorted() is stable, so ties keep the name order like nlargest does
+    top = sorted(merchants, key=lambda r: r['total_cents'], reverse=True)[:10]
+
+    essential = sum(v for k, v in categories.items()
+                    if k in ESSENTIAL_CATEGORIES)
+    discretionary = sum(v for k, v in categories.items()
+                        if k not in ESSENTIAL_CATEGORIES)
+
+    import pandas as pd
+
+    top_prices = pd.DataFrame({'price_cents': store.top_prices(20)})
+
+    return {
+        'monthly_overview': {k: cents_to_price(v) for k, v in store.monthly_totals().items()},
+        'last_month': {
+            'category_breakdown': {k: cents_to_price(v) for k, v in categories.items()},
+            'top_merchants': {r['name']: cents_to_price(r['total_cents']) for r in top},
+            'recurring_expenses': {r['name']: cents_to_price(r['total_cents']) / r['count'] for r in merchants if r['count'] >= 2},
+            'discretionary_vs_essential': {
+                'essential': cents_to_price(essential),
+                'discretionary': cents_to_price(discretionary)
+            },
+            'Combined_Value_of_top_N_transactions': get_sum_of_top_x_transactions(top_prices),
+        }
+    }
+
+
+def split_compare_args(args: list[str]) -> tuple[list[str], list[str]]:
+    """
+    The arguments of the two periods of /compare, split at 'vs' or else in half.
+
+    :raises ValueError: If the arguments can't be split into two periods
+    """
+    if 'vs' in args:
+        i = args.index('vs')
+        return args[:i], args[i + 1:]
+
+    if len(args) not in (2, 4):
+        raise ValueError('two periods are needed')
+    return args[:len(args) // 2], args[len(args) // 2:]
+
+
+def analyze_range(index: DateRangeIndex, start, end):
+    """
+    Analysis of the transactions from start to end (inclusive).
+
+    The totals come from the index's running totals, and only the merchant breakdown looks at the
+    transactions themselves, which are sliced out of the index by position.
+    """
+    categories = index.category_totals(start, end)
+    merchants = merchant_summary(index.transactions(start, end))
+
+    essential = sum(v for k, v in categories.items()
+                    if k in ESSENTIAL_CATEGORIES)
+    discretionary = sum(v for k, v in categories.items()
+                        if k not in ESSENTIAL_CATEGORIES)
+
+    return {
+        'period': f'{start} to {end}',
+        'transactions': index.count(start, end),
+        'total': cents_to_price(essential + discretionary),
+        'category_breakdown': {k: cents_to_price(v) for k, v in categories.items()},
+        'top_merchants': top_merchants(merchants),
+        'recurring_expenses': recurring_expenses(merchants),
+        'discretionary_vs_essential': {
+            'essential': cents_to_price(essential),
+            'discretionary': cents_to_price(discretionary)
+        },
+    }
+
+
+def format_change(before_cents: int, after_cents: int) -> str:
+    """e.g. '$120.00 -> $150.00 (+$30.00)'"""
+    change = after_cents - before_cents
+    sign = '+' if change >= 0 else '-'
+    return (f'${cents_to_price(before_cents):.2f} -> ${cents_to_price(after_cents):.2f} '
+            f'({sign}${cents_to_price(abs(change)):.2f})')
+
+
+def compare_ranges(index: DateRangeIndex, first: tuple, second: tuple):
+    """
+    Total and per-category spending of the second (start, end) period against the first.
+
+    Every figure is a difference of the index's running totals, so the comparison never scans the transactions.
+    """
+    first_categories = index.category_totals(*first)
+    second_categories = index.category_totals(*second)
+
+    # categories in the order of the second period's spending, then the ones only the first period has
+    categories = sorted(second_categories, key=second_categories.get, reverse=True)
+    categories += sorted((k for k in first_categories if k not in second_categories),
+                         key=first_categories.get, reverse=True)
+
+    return {
+        'first_period': f'{first[0]} to {first[1]} ({index.count(*first)} transactions)',
+        'second_period': f'{second[0]} to {second[1]} ({index.count(*second)} transactions)',
+        'total': format_change(sum(first_categories.values()), sum(second_categories.values())),
+        'category_breakdown': {
+            k: format_change(first_categories.get(k, 0), second_categories.get(k, 0)) for k in categories
+        },
+    }
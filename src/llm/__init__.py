@@ -1,3 +1,29 @@
-from src.llm.anthropic import get_llm_client
+import asyncio
 
-llm_client = get_llm_client()
+from src.config.project_settings import LLM_MAX_CONCURRENCY
+
+# bounds the number of concurrent requests made with async_llm_client
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# the factory of each client, see __getattr__
+CLIENT_FACTORIES = {
+    'llm_client': 'get_llm_client',
+    'async_llm_client': 'get_async_llm_client',
+}
+
+
+def __getattr__(name: str):
+    """
+    Create llm_client and async_llm_client on first use.
+
+    The anthropic package takes a noticeable part of the bot's startup time, and most commands never call the LLM.
+    """
+    if name not in CLIENT_FACTORIES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    from src.llm import anthropic as anthropic_clients
+
+    client = getattr(anthropic_clients, CLIENT_FACTORIES[name])()
+    # later lookups find the client in the module and don't go through __getattr__ again
+    globals()[name] = client
+    return client
@@ -1,8 +1,22 @@
-import anthropic
-from anthropic import Anthropic, APIError
+import sys
 
 from src.config.project_secrets import ANTHROPIC_API_KEY
+from src.config.project_settings import ANTHROPIC_BASE_URL
+
+# anthropic is imported in the functions below, so it is only loaded once a client is needed
 
 
 def get_llm_client():
-    return anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    import anthropic
+    return anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, base_url=ANTHROPIC_BASE_URL)
+
+
+def get_async_llm_client():
+    import anthropic
+    return anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY, base_url=ANTHROPIC_BASE_URL)
+
+
+def is_api_error(error: BaseException) -> bool:
+    """Whether error is an anthropic.APIError, without importing anthropic if no client has been created."""
+    anthropic = sys.modules.get('anthropic')
+    return anthropic is not None and isinstance(error, anthropic.APIError)
@@ -0,0 +1,93 @@
+import csv
+import logging
+
+from src import llm
+from src.config.project_settings import LLM_MAX_TOKENS, LLM_MODEL
+from src.llm import llm_semaphore
+from src.utilities.merchant_index import MerchantIndex, normalize_merchant
+from src.utilities.metrics import metrics, stage
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CATEGORY = 'Uncategorized'
+
+CATEGORIZATION_PROMPT = """
+Categorize each of these credit card transaction names (e.g. Shopping, Dining, Travel, Groceries, Transportation).
+{existing_categories}
+Reply with a csv with the columns number, category and one row for every transaction name, using the numbers given.
+Only output the csv and nothing else.
+
+{merchants}
+"""
+
+
+async def categorize_merchants(names: list[str], existing_categories: list[str]) -> dict[str, str]:
+    """
+    Ask the LLM for the category of each merchant name.
+
+    :return: Mapping of each name to its category, names the model skipped are left out
+    """
+    existing = ''
+    if existing_categories:
+        existing = f'Prefer these categories where they fit: {", ".join(existing_categories)}.'
+
+    merchants = '\n'.join(f'{i}. {name}' for i, name in enumerate(names, 1))
+
+    async with llm_semaphore:
+        with stage('llm_call'):
+            message = await llm.async_llm_client.messages.create(
+                model=LLM_MODEL,
+                max_tokens=LLM_MAX_TOKENS,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": CATEGORIZATION_PROMPT.format(existing_categories=existing, merchants=merchants)
+                    }
+                ]
+            )
+
+    metrics.record_llm_usage(LLM_MODEL, message.usage)
+
+    categories = {}
+    lines = message.content[0].text.strip().splitlines()  # type: ignore
+    for row in csv.reader(lines):
+        if len(row) < 2 or not row[0].strip().isdigit():
+            continue
+
+        i = int(row[0]) - 1
+        if 0 <= i < len(names):
+            categories[names[i]] = row[1].strip()
+
+    return categories
+
+
+async def categorize_rows(rows: list[dict], index: MerchantIndex) -> list[dict]:
+    """
+    Fill in the category of each row.
+
+    Merchants seen in earlier statements are categorized from the merchant index, and only the
+    remaining merchants are sent to the LLM. The index is updated with the result.
+    """
+
+    unknown = {}
+    for row in rows:
+        category = index.lookup(row['name'])
+        if category:
+            row['category'] = category
+        elif not row.get('category'):
+            unknown.setdefault(normalize_merchant(row['name']), row['name'])
+
+    log.info(f'{len(rows)} rows, {len(unknown)} unknown merchants to categorize')
+
+    if unknown:
+        names = list(unknown.values())
+        categories = await categorize_merchants(names, index.known_categories())
+
+        for row in rows:
+            if not row.get('category'):
+                name = unknown[normalize_merchant(row['name'])]
+                row['category'] = categories.get(name, DEFAULT_CATEGORY)
+
+    index.update(row for row in rows if row['category'] != DEFAULT_CATEGORY)
+    index.save()
+    return rows
@@ -0,0 +1,435 @@
+import asyncio
+import base64
+import csv
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from src import llm
+from src.config.project_settings import (
+    IMAGE_PAGES_PER_REQUEST,
+    LLM_CHUNK_CHARS,
+    LLM_MAX_TOKENS,
+    LLM_MODEL,
+)
+from src.llm import llm_semaphore
+from src.llm.extraction_cache import extraction_cache
+from src.utilities.data_utilities import CSV_COLUMNS, rows_to_csv
+from src.utilities.metrics import metrics, stage
+
+log = logging.getLogger(__name__)
+
+RowCallback = Callable[[dict], Awaitable[None]]
+
+# number of lines repeated from the previous chunk when a page has to be split, so a
+# transaction that straddles the split is seen whole by at least one of the requests
+CHUNK_OVERLAP_LINES = 8
+
+EXTRACTION_PROMPT = """
+Help me extract each transaction in this credit card statement into a csv table.
+Use the columns date, name, price.
+For BUS/MRT transactions, truncate the id at the end of the transaction name.
+Make sure that the result is a valid csv with a transaction on each row.
+Here's the credit card statement:
+
+{statement}
+
+Please provide the transactions in CSV format.
+"""
+
+
+@dataclass
+class StatementChunk:
+    text: str
+    # True if the chunk starts with lines repeated from the end of the previous chunk
+    overlaps_previous: bool = False
+
+
+def extraction_prompt_template() -> str:
+    current_year = datetime.now().strftime("%Y")
+
+    prompt = EXTRACTION_PROMPT
+    prompt += f'Format the date as %d %b %Y. If the year is missing, use {current_year}.'
+    prompt += f"Don't start the response with a message like 'This was generated by AI'. Only output the csv and nothing else. "
+    return prompt
+
+
+def build_extraction_prompt(statement: str) -> str:
+    return extraction_prompt_template().format(statement=statement)
+
+
+def split_lines_into_chunks(text: str, max_chars: int) -> list[StatementChunk]:
+    """
+    Split text on line boundaries into chunks of at most max_chars characters (plus overlap).
+
+    Every chunk after the first repeats up to CHUNK_OVERLAP_LINES lines from the end of the previous one.
+    """
+    lines = text.splitlines(keepends=True)
+    chunks = []
+
+    start = 0
+    while start < len(lines):
+        end = start
+        size = 0
+        # always take at least one line, even if it is longer than max_chars
+        while end < len(lines) and (end == start or size + len(lines[end]) <= max_chars):
+            size += len(lines[end])
+            end += 1
+
+        # the overlap is capped at half the chunk, so splitting a chunk always makes progress
+        overlap = min(CHUNK_OVERLAP_LINES, (end - start) // 2)
+        overlap_start = start - overlap if chunks else start
+        chunks.append(StatementChunk(
+            ''.join(lines[overlap_start:end]), overlaps_previous=bool(chunks)))
+        start = end
+
+    return chunks
+
+
+def chunk_statement(pages: list[str], max_chars: int = LLM_CHUNK_CHARS) -> list[StatementChunk]:
+    """
+    Group statement pages into chunks of at most max_chars characters.
+
+    Whole pages are kept together where possible. Pages longer than max_chars are split on line boundaries.
+    """
+    chunks = []
+    current_pages = []
+    current_len = 0
+
+    def flush():
+        nonlocal current_pages, current_len
+        if current_pages:
+            chunks.append(StatementChunk(''.join(current_pages)))
+        current_pages = []
+        current_len = 0
+
+    for page in pages:
+        page = '\n\n' + page
+
+        if len(page) > max_chars:
+            flush()
+            chunks.extend(split_lines_into_chunks(page, max_chars))
+            continue
+
+        if current_len + len(page) > max_chars:
+            flush()
+
+        current_pages.append(page)
+        current_len += len(page)
+
+    flush()
+    return chunks
+
+
+def parse_price(value) -> float:
+    """Parse a price written by the model, e.g. '1,234.50' or '$12.30'. Raises ValueError if it isn't a number."""
+    return float(str(value).replace('$', '').replace(',', '').strip())
+
+
+def validate_row(row: dict) -> Optional[dict]:
+    """Normalize a parsed row to the CSV_COLUMNS keys, or return None if it has no date, name or valid price."""
+    row = {col: (row.get(col) or '').strip() for col in CSV_COLUMNS}
+
+    try:
+        row['price'] = f"{parse_price(row['price']):.2f}"
+    except ValueError:
+        log.warning(f'Skipping row with invalid price: {row}')
+        return None
+
+    if not row['date'] or not row['name']:
+        log.warning(f'Skipping incomplete row: {row}')
+        return None
+
+    return row
+
+
+class CsvRowParser:
+    """
+    Incrementally parses CSV text from the model into validated rows, as it is streamed in.
+
+    Markdown code fences are ignored, and the header row is optional.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._fieldnames: Optional[list[str]] = None
+
+    def feed(self, text: str) -> list[dict]:
+        """Add streamed text, returning the rows of any lines it completed."""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        return self._parse_lines(lines)
+
+    def close(self) -> list[dict]:
+        """Parse the last line, which doesn't have to end with a newline."""
+        lines, self._buffer = [self._buffer], ''
+        return self._parse_lines(lines)
+
+    def _parse_lines(self, lines: list[str]) -> list[dict]:
+        rows = []
+        for values in csv.reader(line for line in lines if line.strip() and not line.startswith('```')):
+            if self._fieldnames is None:
+                fieldnames = [v.strip().lower() for v in values]
+                if 'date' in fieldnames:
+                    self._fieldnames = fieldnames
+                    continue
+
+                # the model left out the header row
+                self._fieldnames = CSV_COLUMNS
+
+            row = validate_row(dict(zip(self._fieldnames, values)))
+            if row:
+                rows.append(row)
+
+        return rows
+
+
+def parse_csv_rows(csv_text: str) -> list[dict]:
+    """Parse the CSV returned by the model into rows with the CSV_COLUMNS keys."""
+    parser = CsvRowParser()
+    return parser.feed(csv_text) + parser.close()
+
+
+def row_key(row: dict) -> tuple:
+    return (
+        row['date'].casefold(),
+        ' '.join(row['name'].split()).casefold(),
+        row['price'],
+    )
+
+
+def drop_overlapping_rows(previous_rows: list[dict], rows: list[dict]) -> list[dict]:
+    """
+    Drop rows at the start of a chunk that were already extracted from the overlap at the end of the previous chunk.
+
+    Only the first CHUNK_OVERLAP_LINES rows are checked, and each previous row can only cancel one
+    new row, so genuinely repeated transactions (e.g. two identical bus fares) are kept.
+    """
+    tail = Counter(row_key(row) for row in previous_rows[-CHUNK_OVERLAP_LINES:])
+
+    kept = []
+    for i, row in enumerate(rows):
+        key = row_key(row)
+        if i < CHUNK_OVERLAP_LINES and tail[key] > 0:
+            tail[key] -= 1
+            continue
+        kept.append(row)
+
+    return kept
+
+
+def merge_chunk_rows(chunk_rows: list[list[dict]], chunks: list[StatementChunk]) -> list[dict]:
+    """Concatenate the rows of each chunk in order, removing duplicates caused by chunk overlap."""
+    merged = []
+    for rows, chunk in zip(chunk_rows, chunks):
+        if chunk.overlaps_previous:
+            rows = drop_overlapping_rows(merged, rows)
+        merged.extend(rows)
+    return merged
+
+
+async def stream_csv_rows(content) -> tuple[list[dict], bool]:
+    """
+    Send a message to the model and parse its CSV reply as it is streamed in.
+
+    :param content: Content of the user message, a prompt or a list of content blocks
+    :return: The rows, and whether the reply was cut off at max_tokens. The unfinished last line of a
+        cut off reply is dropped, so a half-written price is never used
+    """
+    parser = CsvRowParser()
+    rows = []
+
+    async with llm_semaphore:
+        with stage('llm_call'):
+            async with llm.async_llm_client.messages.stream(
+                model=LLM_MODEL,
+                max_tokens=LLM_MAX_TOKENS,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": content
+                    }
+                ]
+            ) as stream:
+                async for text in stream.text_stream:
+                    rows.extend(parser.feed(text))
+
+                message = await stream.get_final_message()
+
+    metrics.record_llm_usage(LLM_MODEL, message.usage)
+
+    truncated = message.stop_reason == 'max_tokens'
+    if not truncated:
+        rows.extend(parser.close())
+    return rows, truncated
+
+
+async def gather_rows_in_order(extractions: list[Awaitable[tuple[list[dict], bool]]],
+                               overlaps_previous: list[bool],
+                               on_row: Optional[RowCallback] = None) -> tuple[list[dict], bool]:
+    """
+    Run the extractions of a statement's chunks concurrently, and merge their rows in page order.
+
+    The rows of a chunk are final once it and every chunk before it are done, so they are passed to
+    on_row then, after the rows repeated from the previous chunk's overlap are dropped.
+
+    :param overlaps_previous: Whether each chunk starts with lines repeated from the previous one
+    :return: The merged rows, and whether any of the extractions was truncated
+    """
+    merged = []
+    done: dict[int, list[dict]] = {}
+    next_chunk = 0
+    truncated = False
+    # on_row is awaited, so the chunks are passed on one at a time to keep them in page order
+    lock = asyncio.Lock()
+
+    async def extract(i: int, extraction: Awaitable[tuple[list[dict], bool]]):
+        nonlocal next_chunk, truncated
+        done[i], chunk_truncated = await extraction
+        truncated = truncated or chunk_truncated
+
+        async with lock:
+            while next_chunk in done:
+                rows = done.pop(next_chunk)
+                if overlaps_previous[next_chunk]:
+                    rows = drop_overlapping_rows(merged, rows)
+                merged.extend(rows)
+                next_chunk += 1
+
+                if on_row:
+                    for row in rows:
+                        await on_row(row)
+
+    await asyncio.gather(*(extract(i, extraction) for i, extraction in enumerate(extractions)))
+    return merged, truncated
+
+
+async def extract_chunk_rows(chunk: StatementChunk) -> tuple[list[dict], bool]:
+    """
+    Extract the rows of one chunk.
+
+    If the output hits max_tokens the chunk is extracted again as smaller pieces.
+
+    :return: The rows, and whether some of them are missing because the output of a piece that
+        couldn't be split any further was still cut off
+    """
+    rows, truncated = await stream_csv_rows(build_extraction_prompt(chunk.text))
+    if not truncated:
+        return rows, False
+
+    # the output was cut off, so extract the chunk again as smaller pieces instead of losing rows
+    pieces = split_lines_into_chunks(chunk.text, max_chars=len(chunk.text) // 2)
+    if len(pieces) < 2:
+        log.warning('Chunk output was truncated and the chunk cannot be split further, keeping the partial result.')
+        return rows, True
+
+    log.info(f'Chunk output was truncated, retrying as {len(pieces)} smaller chunks')
+    results = await asyncio.gather(*(extract_chunk_rows(piece) for piece in pieces))
+    return merge_chunk_rows([rows for rows, _ in results], pieces), any(truncated for _, truncated in results)
+
+
+async def extract_transactions(pages: list[str], on_row: Optional[RowCallback] = None) -> list[dict]:
+    """
+    Extract the transactions of a statement with the LLM, leaving the category empty for categorize_rows.
+
+    Results are cached by statement text, prompt and model, so re-sending a statement costs no API calls.
+    Otherwise the statement is split into chunks which are extracted concurrently (bounded by
+    llm_semaphore) and merged back together in page order.
+
+    :param pages: Cleaned text of each statement page
+    :param on_row: Awaited with each row once it is final, in page order, see gather_rows_in_order
+    :return: Rows with the CSV_COLUMNS keys
+    """
+    statement_text = ''.join('\n\n' + page for page in pages)
+    cache_key = extraction_cache.key(
+        statement_text, extraction_prompt_template(), LLM_MODEL)
+
+    cached_csv = extraction_cache.get(cache_key)
+    if cached_csv is not None:
+        log.info(f'Extraction cache hit {extraction_cache.stats()}')
+        return parse_csv_rows(cached_csv)
+
+    chunks = chunk_statement(pages)
+    log.info(f'Querying Claude with {len(chunks)} chunk(s)')
+
+    rows, truncated = await gather_rows_in_order(
+        [extract_chunk_rows(chunk) for chunk in chunks], [chunk.overlaps_previous for chunk in chunks], on_row)
+
+    # a partial result is still returned, but not cached, so the next upload of the statement tries again
+    if not truncated:
+        extraction_cache.put(cache_key, rows_to_csv(rows))
+    return rows
+
+
+def image_extraction_prompt() -> str:
+    return extraction_prompt_template().format(statement='(the statement pages are attached as images)')
+
+
+def image_block(image: bytes) -> dict:
+    return {
+        "type": "image",
+        "source": {
+            "type": "base64",
+            "media_type": "image/jpeg",
+            "data": base64.b64encode(image).decode()
+        }
+    }
+
+
+async def extract_image_rows(images: list[bytes]) -> tuple[list[dict], bool]:
+    """
+    Extract the rows of a group of page images in one request.
+
+    If the output hits max_tokens the pages are extracted again in two halves.
+
+    :return: The rows, and whether some of them are missing, like extract_chunk_rows
+    """
+    content = [image_block(image) for image in images]
+    content.append({"type": "text", "text": image_extraction_prompt()})
+
+    rows, truncated = await stream_csv_rows(content)
+    if not truncated:
+        return rows, False
+
+    if len(images) < 2:
+        log.warning('Page output was truncated and cannot be split further, keeping the partial result.')
+        return rows, True
+
+    half = len(images) // 2
+    log.info(f'Output for {len(images)} pages was truncated, retrying as two requests')
+    (first, first_truncated), (second, second_truncated) = await asyncio.gather(
+        extract_image_rows(images[:half]), extract_image_rows(images[half:]))
+    return first + second, first_truncated or second_truncated
+
+
+async def extract_transactions_from_images(images: list[bytes], on_row: Optional[RowCallback] = None) -> list[dict]:
+    """
+    Extract the transactions of a statement from images of its pages, e.g. for scanned statements without text.
+
+    Works like extract_transactions, with IMAGE_PAGES_PER_REQUEST pages sent in each request.
+
+    :param images: JPEG of each transaction page, in page order
+    """
+    digest = hashlib.sha256()
+    for image in images:
+        digest.update(hashlib.sha256(image).digest())
+    cache_key = extraction_cache.key(
+        f'images:{digest.hexdigest()}', image_extraction_prompt(), LLM_MODEL)
+
+    cached_csv = extraction_cache.get(cache_key)
+    if cached_csv is not None:
+        log.info(f'Extraction cache hit {extraction_cache.stats()}')
+        return parse_csv_rows(cached_csv)
+
+    groups = [images[i:i + IMAGE_PAGES_PER_REQUEST] for i in range(0, len(images), IMAGE_PAGES_PER_REQUEST)]
+    log.info(f'Querying Claude with {len(images)} page image(s) in {len(groups)} request(s)')
+
+    rows, truncated = await gather_rows_in_order(
+        [extract_image_rows(group) for group in groups], [False] * len(groups), on_row)
+
+    if not truncated:
+        extraction_cache.put(cache_key, rows_to_csv(rows))
+    return rows
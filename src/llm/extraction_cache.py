@@ -0,0 +1,75 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from src.config.project_paths import llm_cache_dir
+from src.config.project_settings import LLM_CACHE_MAX_BYTES
+
+log = logging.getLogger(__name__)
+
+
+class ExtractionCache:
+    """
+    On-disk cache of extracted statement CSVs, addressed by a hash of everything that determines the LLM output.
+
+    Entries are evicted least recently used first once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(statement_text: str, prompt_template: str, model: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model, prompt_template, statement_text):
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}.csv'
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            csv_text = path.read_text()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        # bump the mtime so eviction treats this entry as recently used
+        path.touch()
+        self.hits += 1
+        return csv_text
+
+    def put(self, key: str, csv_text: str):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = self._path(key).with_suffix('.tmp')
+        tmp_path.write_text(csv_text)
+        os.replace(tmp_path, self._path(key))
+
+        self.evict()
+
+    def evict(self):
+        entries = sorted(self.cache_dir.glob('*.csv'),
+                         key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in entries)
+
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+            log.info(f'evicted {path.name} from the extraction cache')
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+extraction_cache = ExtractionCache(llm_cache_dir, LLM_CACHE_MAX_BYTES)
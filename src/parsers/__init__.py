@@ -0,0 +1,45 @@
+import logging
+from pathlib import Path
+from typing import Optional
+
+from src.parsers.base import StatementParseError, StatementParser
+from src.parsers.uob import UOBParser
+from src.utilities.image_utilities import run_in_process_pool
+
+log = logging.getLogger(__name__)
+
+# statements are parsed by the first parser whose layout they match
+PARSERS: list[StatementParser] = [
+    UOBParser(),
+]
+
+
+def parse_statement(pdf_file: Path) -> Optional[list[dict]]:
+    """
+    Parse the transactions of a statement in one of the known layouts, without the LLM.
+
+    :return: Rows with the CSV_COLUMNS keys and an empty category, or None if the statement has to go through the LLM
+    """
+    import pymupdf
+
+    with pymupdf.open(pdf_file) as doc:
+        first_page_text = doc[0].get_text() if len(doc) else ''
+
+        for parser in PARSERS:
+            if not parser.matches(first_page_text):
+                continue
+
+            try:
+                rows = parser.parse(doc)
+            except StatementParseError as e:
+                log.warning(f'{parser.name} parser failed on {pdf_file.name}, falling back to the LLM: {e}')
+                return None
+
+            log.info(f'{pdf_file.name} parsed by the {parser.name} parser: {len(rows)} transactions')
+            return rows
+
+    return None
+
+
+async def parse_statement_async(pdf_file: Path) -> Optional[list[dict]]:
+    return await run_in_process_pool(parse_statement, pdf_file)
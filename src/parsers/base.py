@@ -0,0 +1,51 @@
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pymupdf
+
+
+class StatementParseError(Exception):
+    """Raised when a statement in a known layout can't be parsed, or its rows don't add up to the statement's totals."""
+
+
+class StatementParser(ABC):
+    """
+    Parses the transaction table of one bank's statement layout straight from the PDF, without the LLM.
+
+    Subclasses are added to PARSERS in src/parsers/__init__.py, which fails to import if one of
+    them doesn't implement both methods.
+    """
+    name = ''
+
+    @abstractmethod
+    def matches(self, first_page_text: str) -> bool:
+        """Whether the statement is in this parser's layout."""
+
+    @abstractmethod
+    def parse(self, doc: 'pymupdf.Document') -> list[dict]:
+        """
+        Parse the transactions of the statement.
+
+        :return: Rows with the CSV_COLUMNS keys and an empty category
+        :raises StatementParseError: If the statement doesn't match the layout or fails validation
+        """
+
+
+def page_lines(page: 'pymupdf.Page', y_tolerance: float = 2) -> list[list[str]]:
+    """
+    Group the words of a page into lines by their vertical position.
+
+    :return: The words of each line, top to bottom, each line's words left to right
+    """
+    words = sorted(page.get_text('words'), key=lambda w: (w[3], w[0]))
+
+    lines = []
+    line_y = None
+    for x0, y0, x1, y1, word, *_ in words:
+        if line_y is None or y1 - line_y > y_tolerance:
+            lines.append([])
+            line_y = y1
+        lines[-1].append((x0, word))
+
+    return [[word for _, word in sorted(line)] for line in lines]
@@ -0,0 +1,92 @@
+import logging
+import re
+from datetime import date, datetime
+from typing import TYPE_CHECKING
+
+from src.parsers.base import StatementParseError, StatementParser, page_lines
+from src.utilities.data_utilities import TRANSACTION_END_PATTERN
+
+if TYPE_CHECKING:
+    import pymupdf
+
+log = logging.getLogger(__name__)
+
+# e.g. "01 JUL 02 JUL GRAB*RIDES SINGAPORE 12.30" or "... PAYMENT RECEIVED 500.00 CR"
+TRANSACTION_LINE_PATTERN = re.compile(
+    r'^(?P<post_date>\d{2} [A-Z]{3}) (?P<trans_date>\d{2} [A-Z]{3}) (?P<name>.+?) (?P<amount>[\d,]+\.\d{2})(?P<credit> CR)?$')
+
+SUBTOTAL_LINE_PATTERN = re.compile(r'^SUB TOTAL (?P<amount>[\d,]+\.\d{2})(?P<credit> CR)?$')
+
+# carried over from the last statement, and included in the card's sub total
+PREVIOUS_BALANCE_LINE_PATTERN = re.compile(r'^PREVIOUS BALANCE (?P<amount>[\d,]+\.\d{2})(?P<credit> CR)?$')
+
+STATEMENT_DATE_PATTERN = re.compile(r'STATEMENT DATE (\d{2} [A-Z]{3} \d{4})', flags=re.IGNORECASE)
+
+BUS_MRT_PATTERN = re.compile(r'^(BUS/MRT)\s+\d+$')
+
+
+def parse_amount(amount: str, credit: bool) -> float:
+    value = float(amount.replace(',', ''))
+    return -value if credit else value
+
+
+def transaction_date(day_month: str, statement_date: date) -> date:
+    """Date of a "DD MON" transaction, in the year before the statement if it would otherwise be after it."""
+    parsed = datetime.strptime(f'{day_month} {statement_date.year}', '%d %b %Y').date()
+    if parsed > statement_date:
+        parsed = parsed.replace(year=statement_date.year - 1)
+    return parsed
+
+
+class UOBParser(StatementParser):
+    name = 'uob'
+
+    def matches(self, first_page_text: str) -> bool:
+        return 'United Overseas Bank' in first_page_text and STATEMENT_DATE_PATTERN.search(first_page_text) is not None
+
+    def parse(self, doc: 'pymupdf.Document') -> list[dict]:
+        statement_date_match = STATEMENT_DATE_PATTERN.search(doc[0].get_text())
+        if not statement_date_match:
+            raise StatementParseError('statement date not found')
+        statement_date = datetime.strptime(statement_date_match.group(1).title(), '%d %b %Y').date()
+
+        rows = []
+        # the previous balances and the transactions, which add up to the sub totals
+        total = 0.0
+        subtotal = None
+
+        for page in doc:
+            for words in page_lines(page):
+                line = ' '.join(words)
+                if TRANSACTION_END_PATTERN.search(line):
+                    return self.validate(rows, total, subtotal)
+
+                if match := TRANSACTION_LINE_PATTERN.match(line):
+                    price = parse_amount(match['amount'], bool(match['credit']))
+                    total += price
+                    rows.append({
+                        'date': transaction_date(match['trans_date'].title(), statement_date).strftime('%d %b %Y'),
+                        'name': BUS_MRT_PATTERN.sub(r'\1', match['name']),
+                        'price': f'{price:.2f}',
+                        'category': '',
+                    })
+
+                elif match := PREVIOUS_BALANCE_LINE_PATTERN.match(line):
+                    total += parse_amount(match['amount'], bool(match['credit']))
+
+                elif match := SUBTOTAL_LINE_PATTERN.match(line):
+                    # statements with several cards have a sub total per card
+                    subtotal = (subtotal or 0.0) + parse_amount(match['amount'], bool(match['credit']))
+
+        raise StatementParseError('end of transaction details not found')
+
+    @staticmethod
+    def validate(rows: list[dict], total: float, subtotal) -> list[dict]:
+        if not rows:
+            raise StatementParseError('no transactions found')
+        if subtotal is None:
+            raise StatementParseError('sub total not found')
+        if abs(total - subtotal) >= 0.005:
+            raise StatementParseError(
+                f'previous balance and transactions add up to {total:.2f}, but the sub total is {subtotal:.2f}')
+        return rows
@@ -1,11 +1,32 @@
 import csv
+import hashlib
 import io
+import logging
 import os
 import re
-
-import pandas as pd
+from collections import Counter
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import TYPE_CHECKING
 
 from src.config.project_paths import data_dir
+from src.utilities.dataframe_cache import dataframe_cache
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
+CSV_COLUMNS = ['date', 'name', 'price', 'category']
+
+# columns of the transaction DataFrames returned by read_transaction_csvs and TransactionStore.read_transactions.
+# Prices are in integer cents so totals add up exactly, and merchants and categories, which repeat a lot,
+# are stored as categorical codes
+TRANSACTION_DTYPES = {
+    'date': 'datetime64[ns]',
+    'name': 'category',
+    'price_cents': 'int64',
+    'category': 'category',
+}
 
 
 def safe_float(value):
@@ -15,11 +36,91 @@ def safe_float(value):
         return float(0)
 
 
-def sum_prices_from_csv(csv_content):
-    csv_file = io.StringIO(csv_content)
-    reader = csv.DictReader(csv_file)
-    total_price = sum(float(row.get('price', 0) or 0) for row in reader)
-    return total_price
+def safe_cents(value) -> int:
+    """Price in integer cents, e.g. '1,234.56' -> 123456. Unparseable prices count as 0, like safe_float."""
+    try:
+        return int((Decimal(str(value or 0).replace(',', '')) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        return 0
+
+
+def cents_to_price(cents) -> float:
+    return float(cents) / 100
+
+
+def to_cents(prices: 'pd.Series') -> 'pd.Series':
+    """Prices in dollars, as numbers or strings, to int64 cents. Unparseable prices count as 0."""
+    import pandas as pd
+
+    return (pd.to_numeric(prices, errors='coerce').fillna(0) * 100).round().astype('int64')
+
+
+def to_transaction_frame(df: 'pd.DataFrame') -> 'pd.DataFrame':
+    """
+    Convert a DataFrame of transactions to the TRANSACTION_DTYPES columns.
+
+    :param df: Transactions with datetime64 dates, and either a price column in dollars or price_cents
+    """
+    import pandas as pd
+
+    return pd.DataFrame({
+        'date': df['date'],
+        'name': df['name'].astype('category'),
+        'price_cents': df['price_cents'].astype('int64') if 'price_cents' in df else to_cents(df['price']),
+        'category': df['category'].fillna('').astype('category'),
+    })
+
+
+def normalize_transaction_name(name: str) -> str:
+    """
+    Transaction name with case, punctuation and spacing differences removed, e.g. "Grab* Rides" -> "GRAB RIDES".
+
+    Unlike merchant_index.normalize_merchant, reference numbers are kept, as they tell transactions apart.
+    """
+    return re.sub(r'[^A-Z0-9]+', ' ', str(name).upper()).strip()
+
+
+def transaction_key(date: str, name: str, price: float, card: str = '') -> str:
+    """
+    Normalized key of a transaction, the same for every copy of it in overlapping statements or re-exports.
+
+    :param date: ISO date of the transaction
+    :param card: The card the transaction was made with, if the statement says
+    """
+    return f'{date}|{normalize_transaction_name(name)}|{round(price * 100)}|{card}'
+
+
+def dedup_keys(transactions) -> list[str]:
+    """
+    Keys of the (date, name, price, card) transactions of one statement, numbered by occurrence.
+
+    A statement can have the same transaction twice, e.g. two identical coffees on the same day. The
+    numbering keeps those apart, while the first of them still matches the first copy in another statement.
+    """
+    occurrences = Counter()
+    keys = []
+    for transaction in transactions:
+        key = transaction_key(*transaction)
+        keys.append(f'{key}|{occurrences[key]}')
+        occurrences[key] += 1
+    return keys
+
+
+def rows_to_csv(rows: list[dict]) -> str:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CSV_COLUMNS,
+                            extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
 
 def list_transaction_csvs(folder_path=data_dir):
@@ -31,18 +132,38 @@ def list_transaction_csvs(folder_path=data_dir):
     return files
 
 
-def read_transaction_csvs(folder_path=data_dir, latest_only=False):
+def read_transaction_csvs(folder_path=data_dir):
+    """
+    Read the transaction CSVs in folder_path into a single DataFrame sorted by date.
+
+    Results are cached in memory until a CSV in the folder is added, removed or modified.
+    """
+    csv_stats = tuple(sorted(
+        (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+        for entry in os.scandir(folder_path) if entry.name.endswith('.csv')
+    ))
+
+    return dataframe_cache.get_or_load(
+        ('csv', str(folder_path)),
+        csv_stats,
+        lambda: load_transaction_csvs(folder_path))
+
+
+def load_transaction_csvs(folder_path=data_dir):
+    import pandas as pd
+
     # List to store DataFrames for each CSV file
     dfs = []
 
+    # Overlapping statements and re-exports repeat transactions, which would be counted twice, so they are
+    # dropped by their dedup_keys like TransactionStore.add_statement does
+    seen_keys = set()
+    duplicates = 0
+
     # Get all CSV files in the folder
     csv_files = [f for f in os.listdir(folder_path) if f.endswith('.csv')]
 
-    # If latest_only is True, select only the latest file
-    if latest_only and csv_files:
-        csv_files = [max(csv_files, key=lambda f: f.split('_')[-1])]
-
-    # Iterate through the selected files
+    # Iterate through the files
     for filename in csv_files:
         file_path = os.path.join(folder_path, filename)
 
@@ -58,15 +179,26 @@ def read_transaction_csvs(folder_path=data_dir, latest_only=False):
         # Convert date string to datetime object
         df['date'] = pd.to_datetime(df['date'], format='%d %b %Y')
 
-        # Convert price to float
-        df['price'] = df['price'].astype(float)
+        # Convert price to integer cents
+        df['price_cents'] = to_cents(df['price'])
+
+        cards = df['card'].fillna('') if 'card' in df else [''] * len(df)
+        keys = dedup_keys(zip(df['date'].dt.strftime('%Y-%m-%d'), df['name'], df['price_cents'] / 100, cards))
+        duplicated = [key in seen_keys for key in keys]
+        seen_keys.update(keys)
+        duplicates += sum(duplicated)
 
         # Add the DataFrame to our list
-        dfs.append(df)
+        dfs.append(df[[not d for d in duplicated]])
 
     # Combine all DataFrames into a single DataFrame
     if dfs:
         combined_df = pd.concat(dfs, ignore_index=True)
+        if duplicates:
+            log.info(f'Dropped {duplicates} duplicate transactions from {folder_path}')
+
+        # Categories are only assigned once all files are combined, concat would turn them back into strings
+        combined_df = to_transaction_frame(combined_df)
 
         # Sort the combined DataFrame by date
         combined_df = combined_df.sort_values('date')
@@ -77,18 +209,18 @@ def read_transaction_csvs(folder_path=data_dir, latest_only=False):
         return None
 
 
+TRANSACTION_END_PATTERN = re.compile(
+    r'\-+ end of transaction details \-+', flags=re.IGNORECASE)
+
+
 def remove_text_after_transaction_end(text: str):
     """
     Split a string using the regex pattern for "end of transaction details".
 
     :param text: The input string to split
-    :return: A list of substrings split by the pattern
+    :return: The part of the string before the pattern
     """
-    pattern = r'\-+ end of transaction details \-+'
-
-    # re.IGNORECASE flag makes the regex case-insensitive
-    # re.split() splits the string based on the pattern
-    parts = re.split(pattern, text, flags=re.IGNORECASE)
+    parts = TRANSACTION_END_PATTERN.split(text, maxsplit=1)
     return parts[0]
 
 
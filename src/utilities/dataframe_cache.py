@@ -0,0 +1,67 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Hashable, Optional
+
+from src.config.project_settings import DATAFRAME_CACHE_ENTRIES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
+
+class DataFrameCache:
+    """
+    Process-level cache of loaded DataFrames.
+
+    Each entry remembers the version of the data it was loaded from, and is reloaded as soon as the
+    version passed in by the caller changes (e.g. a counter bumped on ingest, or the mtimes of the source files).
+    At most max_entries DataFrames are kept, dropping the least recently used first.
+    """
+
+    def __init__(self, max_entries: int = DATAFRAME_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, tuple[Hashable, Optional['pd.DataFrame'], float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Hashable, version: Hashable, loader: Callable[[], Optional['pd.DataFrame']]) -> Optional['pd.DataFrame']:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            df = entry[1]
+            self._entries.move_to_end(key)
+        else:
+            self.misses += 1
+            df = loader()
+            self._entries[key] = (version, df, time.time())
+            self._entries.move_to_end(key)
+            log.info(f'loaded {key} at version {version}')
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        # shallow copy, so callers assigning columns don't modify the cached frame
+        return None if df is None else df.copy(deep=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def state(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': {
+                str(key): {
+                    'version': str(version)[:80],
+                    'rows': 0 if df is None else len(df),
+                    'bytes': 0 if df is None else int(df.memory_usage(deep=True).sum()),
+                    'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(loaded_at)),
+                }
+                for key, (version, df, loaded_at) in self._entries.items()
+            },
+        }
+
+
+dataframe_cache = DataFrameCache()
@@ -0,0 +1,108 @@
+import re
+from calendar import monthrange
+from datetime import date, timedelta
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+PERIOD_PATTERN = re.compile(r'^(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?$')
+
+
+def parse_period_bound(text: str) -> tuple[date, date]:
+    """
+    First and last day of a YYYY, YYYY-MM or YYYY-MM-DD period.
+
+    :raises ValueError: If text isn't a valid period
+    """
+    match = PERIOD_PATTERN.match(text)
+    if not match:
+        raise ValueError(f'{text} is not a YYYY, YYYY-MM or YYYY-MM-DD date')
+
+    year, month, day = (int(g) if g else None for g in match.groups())
+    if day:
+        first = date(year, month, day)
+        return first, first
+    if month:
+        return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def parse_period(args: list[str]) -> tuple[date, date]:
+    """
+    The period given by one or two command arguments, e.g. ['2024'], ['2024-06'] or ['2024-01-15', '2024-03'].
+
+    With two arguments the period runs from the start of the first to the end of the second.
+
+    :raises ValueError: If the arguments aren't a valid period
+    """
+    if len(args) not in (1, 2):
+        raise ValueError('a period is one date, or a start and an end date')
+
+    start, end = parse_period_bound(args[0])[0], parse_period_bound(args[-1])[1]
+    if end < start:
+        raise ValueError(f'{args[-1]} is before {args[0]}')
+    return start, end
+
+
+class DateRangeIndex:
+    """
+    Transactions sorted by date, with running totals per category.
+
+    The totals of any date range are the difference of the running totals at its two ends, which are
+    found by binary search, so they cost O(log n) per category however many transactions the range covers.
+    """
+
+    def __init__(self, df: 'pd.DataFrame'):
+        """
+        :param df: Transactions with the TRANSACTION_DTYPES columns
+        """
+        import numpy as np
+
+        self.df = df if df['date'].is_monotonic_increasing else df.sort_values('date', kind='stable')
+        self.dates = self.df['date'].to_numpy()
+        self.categories = list(self.df['category'].cat.categories)
+
+        # the transactions grouped by category, still in date order within each, so the transactions of
+        # category c are positions starts[c] to starts[c + 1] of category_dates. cents[i] is the total of
+        # the first i of them, so the total of any run of one category's transactions is a difference
+        codes = self.df['category'].cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable')
+        self.starts = np.searchsorted(codes[order], np.arange(len(self.categories) + 1))
+        self.category_dates = self.dates[order]
+        self.cents = np.concatenate(([0], np.cumsum(self.df['price_cents'].to_numpy()[order])))
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @staticmethod
+    def _search(dates, start: date, end: date) -> tuple[int, int]:
+        import numpy as np
+
+        return (
+            int(np.searchsorted(dates, np.datetime64(start, 'ns'), side='left')),
+            int(np.searchsorted(dates, np.datetime64(end + timedelta(days=1), 'ns'), side='left')),
+        )
+
+    def bounds(self, start: date, end: date) -> tuple[int, int]:
+        """Positions of the first transaction on or after start, and of the first one after end."""
+        return self._search(self.dates, start, end)
+
+    def category_totals(self, start: date, end: date) -> dict[str, int]:
+        """Total cents spent in each category from start to end (inclusive), for the categories with transactions."""
+        totals = {}
+        for c, category in enumerate(self.categories):
+            first = self.starts[c]
+            lo, hi = self._search(self.category_dates[first:self.starts[c + 1]], start, end)
+            if hi > lo:
+                totals[category] = int(self.cents[first + hi] - self.cents[first + lo])
+        return totals
+
+    def count(self, start: date, end: date) -> int:
+        lo, hi = self.bounds(start, end)
+        return hi - lo
+
+    def transactions(self, start: date, end: date) -> 'pd.DataFrame':
+        """The transactions from start to end (inclusive), sliced by position instead of masking every row."""
+        lo, hi = self.bounds(start, end)
+        return self.df.iloc[lo:hi]
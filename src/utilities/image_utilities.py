@@ -1,72 +1,137 @@
-import io
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-
-import pymupdf
-
+from typing import Iterator, Optional
+
+from src.config.project_settings import (
+    IMAGE_DPI,
+    IMAGE_GRAYSCALE,
+    IMAGE_JPEG_QUALITY,
+    IMAGE_MAX_PAGES,
+    PDF_WORKERS,
+)
 from src.utilities.data_utilities import (
+    TRANSACTION_END_PATTERN,
     remove_text_after_transaction_end,
-    remove_uob_disclaimer,
 )
+from src.utilities.statement_cleaning import clean_statement_pages
 
+log = logging.getLogger(__name__)
 
-def pdf_to_text(pdf_file: Path):
-    doc = pymupdf.open(pdf_file)  # open a document
-    all_text = ''
+# pymupdf is imported by the functions that use it, which mostly run in the process pool,
+# so the bot itself doesn't load it until a statement is processed
 
-    for page in doc:  # iterate the document pages
-        text = page.get_text()  # get plain text encoded as UTF-8
-        all_text += '\n\n' + text
-    all_text = remove_uob_disclaimer(all_text)
-    return remove_text_after_transaction_end(all_text)
+_process_pool: Optional[ProcessPoolExecutor] = None
 
 
-def pdf_to_images(pdf_file: Path, output_format: str = 'png'):
-    doc = pymupdf.open(pdf_file)  # open document
+def get_process_pool() -> ProcessPoolExecutor:
+    """Process pool shared by all PDF work, so PyMuPDF never runs on the event loop thread."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _process_pool
 
-    image_files = []
-    try:
-        for i, page in enumerate(doc):
-            pix = page.get_pixmap()  # render page to an image
-            out = pdf_file.parent / f'{pdf_file.stem}_{i}.{output_format}'
-            pix.save(str(out))
 
-            img_buffer = pixmap_to_bytes_io(pix, output_format)
-            image_files.append(img_buffer)
+def shutdown_process_pool():
+    """Stop the process pool's workers, e.g. before a process that isn't the main one exits."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
 
-        return image_files
-    except Exception as e:
-        print(f"Error converting PDF to images: {str(e)}")
-        return None
 
+def iter_page_texts(pdf_file: Path) -> Iterator[str]:
+    """
+    Yield the plain text of each page in the PDF.
 
-def pixmap_to_bytes_io(pixmap: pymupdf.Pixmap, output_format: str = 'PNG') -> io.BytesIO:
+    Stops after the first page containing the "end of transaction details" marker,
+    so the remaining pages of the statement are never extracted.
     """
-    Convert a PyMuPDF Pixmap to a BytesIO object.
+    import pymupdf
 
-    :param pixmap: fitz.Pixmap object to convert
-    :param output_format: Output image format (default is PNG)
-    :return: BytesIO object containing the image data
+    with pymupdf.open(pdf_file) as doc:
+        for page in doc:
+            text = page.get_text()  # get plain text encoded as UTF-8
+            yield text
+
+            if TRANSACTION_END_PATTERN.search(text):
+                break
+
+
+def pdf_to_pages(pdf_file: Path) -> list[str]:
     """
-    # Ensure the output format is uppercase
-    output_format = output_format.upper()
+    Extract the cleaned text of each transaction page of the statement.
 
-    # Check if the pixmap has an alpha channel
-    if pixmap.alpha:
-        # If it has an alpha channel, we need to remove it for certain formats
-        pix = pymupdf.Pixmap(pixmap, 0) if output_format in [
-            'JPEG', 'JPG'] else pixmap
-    else:
-        pix = pixmap
+    :param pdf_file: Path to the statement PDF
+    :return: One string per page, cleaned by clean_statement_pages, with everything after the end of the transaction details removed
+    """
+    pages = list(iter_page_texts(pdf_file))
 
-    # Convert the pixmap to bytes
-    img_bytes = pix.tobytes(output_format)
+    # iter_page_texts stops at the page containing the end marker, so only the last page needs truncating
+    if pages:
+        pages[-1] = remove_text_after_transaction_end(pages[-1])
 
-    # Create a BytesIO object from the bytes
-    img_buffer = io.BytesIO(img_bytes)
-    img_buffer.seek(0)
+    pages, report = clean_statement_pages(pages)
+    log.info(f'{pdf_file.name}: cleaned with the {report.profile} profile from ~{report.tokens_before} '
+             f'to ~{report.tokens_after} tokens, {report.repeated_lines_dropped} repeated lines dropped')
+    return pages
 
-    # If we created a new pixmap (pix) without alpha, we need to clear it from memory
-    if pix != pixmap:
-        pix = None
 
-    return img_buffer
+def pdf_to_text(pdf_file: Path):
+    return ''.join('\n\n' + page for page in pdf_to_pages(pdf_file))
+
+
+async def run_in_process_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
+
+
+async def pdf_to_pages_async(pdf_file: Path) -> list[str]:
+    return await run_in_process_pool(pdf_to_pages, pdf_file)
+
+
+def count_transaction_pages(pdf_file: Path, max_pages: int = IMAGE_MAX_PAGES) -> int:
+    """
+    Number of pages up to and including the end of the transaction details.
+
+    Without the end marker, e.g. in a scanned statement without text, the pages after the transactions
+    can't be told apart, so only the first max_pages are counted (0 for all of them).
+    """
+    n_pages = 0
+    for text in iter_page_texts(pdf_file):
+        n_pages += 1
+        if TRANSACTION_END_PATTERN.search(text):
+            return n_pages
+
+    if max_pages and n_pages > max_pages:
+        log.warning(f'{pdf_file.name}: end of transaction details not found, only using the first {max_pages} of {n_pages} pages')
+        return max_pages
+    return n_pages
+
+
+def render_page_jpeg(pdf_file: Path, page_number: int, dpi: int = IMAGE_DPI,
+                     grayscale: bool = IMAGE_GRAYSCALE, jpeg_quality: int = IMAGE_JPEG_QUALITY) -> bytes:
+    """Render one page of the PDF to JPEG bytes in memory."""
+    import pymupdf
+
+    with pymupdf.open(pdf_file) as doc:
+        colorspace = pymupdf.csGRAY if grayscale else pymupdf.csRGB
+        pix = doc[page_number].get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+        return pix.tobytes('jpeg', jpg_quality=jpeg_quality)
+
+
+def pdf_to_images(pdf_file: Path, dpi: int = IMAGE_DPI, grayscale: bool = IMAGE_GRAYSCALE,
+                  jpeg_quality: int = IMAGE_JPEG_QUALITY) -> list[bytes]:
+    """Render the transaction pages of the statement to JPEGs, one after the other."""
+    return [render_page_jpeg(pdf_file, i, dpi, grayscale, jpeg_quality)
+            for i in range(count_transaction_pages(pdf_file))]
+
+
+async def pdf_to_images_async(pdf_file: Path, dpi: int = IMAGE_DPI, grayscale: bool = IMAGE_GRAYSCALE,
+                              jpeg_quality: int = IMAGE_JPEG_QUALITY) -> list[bytes]:
+    """Render the transaction pages of the statement to JPEGs, one page per task in the process pool."""
+    n_pages = await run_in_process_pool(count_transaction_pages, pdf_file)
+    return list(await asyncio.gather(*(
+        run_in_process_pool(render_page_jpeg, pdf_file, i, dpi, grayscale, jpeg_quality)
+        for i in range(n_pages))))
@@ -0,0 +1,222 @@
+import json
+import logging
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from src.config.project_paths import ingestion_jobs_db_path
+from src.config.project_settings import INGESTION_MAX_ATTEMPTS, INGESTION_RETRY_SECONDS
+
+log = logging.getLogger(__name__)
+
+# a job moves through these states in order, each one recorded once its stage is done
+JOB_STATES = ('received', 'downloaded', 'extracted', 'llm_done', 'written')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    chat_id INTEGER NOT NULL,
+    file_unique_id TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    message_id INTEGER,
+    use_images INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    -- JSON of the rows of the last completed stage, so a resumed job never repeats an LLM request
+    rows TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL,
+    last_error TEXT,
+    failed_at TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (chat_id, file_unique_id)
+);
+CREATE INDEX IF NOT EXISTS ingestion_jobs_state ON ingestion_jobs (state);
+"""
+
+
+@dataclass
+class IngestionJob:
+    """An uploaded statement on its way to the transaction store."""
+    chat_id: int
+    # Telegram's id of the file, the same for every upload of the same file
+    file_unique_id: str
+    file_id: str
+    file_name: str
+    # the upload, which replies about the job are sent to
+    message_id: Optional[int] = None
+    use_images: bool = False
+    state: str = 'received'
+    rows: Optional[list[dict]] = None
+    attempts: int = 0
+    # unix time of the next retry, None when the job isn't waiting for one
+    next_attempt_at: Optional[float] = None
+    last_error: Optional[str] = None
+    # set once the job has run out of attempts
+    failed_at: Optional[str] = None
+
+    @property
+    def key(self) -> tuple[int, str]:
+        return self.chat_id, self.file_unique_id
+
+    @property
+    def done(self) -> bool:
+        return self.state == 'written'
+
+    @property
+    def failed(self) -> bool:
+        return self.failed_at is not None
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before retrying a job that has failed attempts times."""
+    return INGESTION_RETRY_SECONDS * 2 ** (attempts - 1)
+
+
+def from_db_row(row: sqlite3.Row) -> IngestionJob:
+    values = {field.name: row[field.name] for field in fields(IngestionJob)}
+    values['use_images'] = bool(values['use_images'])
+    values['rows'] = json.loads(values['rows']) if values['rows'] else None
+    return IngestionJob(**values)
+
+
+class IngestionJobStore:
+    """
+    SQLite file recording the progress of every uploaded statement, keyed by chat and Telegram file_unique_id.
+
+    A job's state and the rows produced by its last completed stage are written in one transaction,
+    so after a crash or restart the job carries on from that stage. The file is shared by every
+    chat (and every webhook worker), so all unfinished jobs can be found on startup.
+    """
+
+    def __init__(self, db_path: Path = ingestion_jobs_db_path):
+        self.db_path = db_path
+        self._initialized = False
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.row_factory = sqlite3.Row
+
+            if not self._initialized:
+                conn.executescript(SCHEMA)
+                self._initialized = True
+
+            with conn:
+                yield conn
+
+    def get(self, chat_id: int, file_unique_id: str) -> Optional[IngestionJob]:
+        with self.connect() as conn:
+            row = conn.execute(
+                'SELECT * FROM ingestion_jobs WHERE chat_id = ? AND file_unique_id = ?',
+                (chat_id, file_unique_id)).fetchone()
+        return from_db_row(row) if row else None
+
+    def create(self, job: IngestionJob) -> tuple[IngestionJob, bool]:
+        """
+        Record a new job, unless the chat already has one for the same file.
+
+        :return: The stored job, and whether it was created by this call
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        with self.connect() as conn:
+            created = conn.execute(
+                'INSERT OR IGNORE INTO ingestion_jobs '
+                '(chat_id, file_unique_id, file_id, file_name, message_id, use_images, state, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (job.chat_id, job.file_unique_id, job.file_id, job.file_name, job.message_id,
+                 int(job.use_images), job.state, now, now)).rowcount == 1
+
+        if created:
+            return job, True
+
+        existing = self.get(job.chat_id, job.file_unique_id)
+        assert existing, f'job for {job.file_unique_id} was neither created nor found'
+        return existing, False
+
+    def save(self, job: IngestionJob):
+        with self.connect() as conn:
+            conn.execute(
+                'UPDATE ingestion_jobs SET file_id = ?, message_id = ?, use_images = ?, state = ?, rows = ?, '
+                'attempts = ?, next_attempt_at = ?, last_error = ?, failed_at = ?, updated_at = ? '
+                'WHERE chat_id = ? AND file_unique_id = ?',
+                (job.file_id, job.message_id, int(job.use_images), job.state,
+                 json.dumps(job.rows) if job.rows is not None else None,
+                 job.attempts, job.next_attempt_at, job.last_error, job.failed_at,
+                 datetime.now().isoformat(timespec='seconds'), job.chat_id, job.file_unique_id))
+
+    def advance(self, job: IngestionJob, state: str, rows: Optional[list[dict]] = None) -> IngestionJob:
+        """Record that the job has completed the stage leading to state, along with the rows it produced."""
+        assert JOB_STATES.index(state) > JOB_STATES.index(job.state), f'job cannot go from {job.state} to {state}'
+
+        job.state = state
+        if rows is not None:
+            job.rows = rows
+        if state == 'written':
+            # the rows are in the transaction store now
+            job.rows = None
+        # every stage gets INGESTION_MAX_ATTEMPTS attempts
+        job.attempts = 0
+        job.next_attempt_at = None
+        job.last_error = None
+        self.save(job)
+        log.info(f'job {job.file_unique_id} of chat {job.chat_id} ({job.file_name}) is {state}')
+        return job
+
+    def record_failure(self, job: IngestionJob, error: str) -> IngestionJob:
+        """
+        Record a failed attempt at the job's next stage, scheduling a retry or, after INGESTION_MAX_ATTEMPTS, giving up.
+        """
+        job.attempts += 1
+        if job.attempts >= INGESTION_MAX_ATTEMPTS:
+            return self.give_up(job, error)
+
+        job.last_error = error
+        job.next_attempt_at = time.time() + retry_delay(job.attempts)
+        self.save(job)
+        return job
+
+    def give_up(self, job: IngestionJob, error: str) -> IngestionJob:
+        """Mark the job as failed, until its statement is sent again."""
+        job.last_error = error
+        job.next_attempt_at = None
+        job.failed_at = datetime.now().isoformat(timespec='seconds')
+        self.save(job)
+        return job
+
+    def reset(self, job: IngestionJob) -> IngestionJob:
+        """Give a failed job a fresh set of attempts, carrying on from its last completed stage."""
+        job.attempts = 0
+        job.next_attempt_at = None
+        job.failed_at = None
+        self.save(job)
+        return job
+
+    def restart(self, job: IngestionJob) -> IngestionJob:
+        """Run the job again from the start, e.g. to extract it another way. Its rows in the store are replaced once it is written again."""
+        job.state = 'received'
+        job.rows = None
+        job.attempts = 0
+        job.next_attempt_at = None
+        job.last_error = None
+        job.failed_at = None
+        self.save(job)
+        log.info(f'job {job.file_unique_id} of chat {job.chat_id} ({job.file_name}) restarted')
+        return job
+
+    def unfinished(self) -> list[IngestionJob]:
+        """Jobs that are neither written nor failed, oldest first."""
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM ingestion_jobs WHERE state != 'written' AND failed_at IS NULL "
+                'ORDER BY created_at').fetchall()
+        return [from_db_row(row) for row in rows]
+
+
+ingestion_jobs = IngestionJobStore()
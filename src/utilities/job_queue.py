@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+log = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    In-process queue that runs async jobs on a fixed number of worker tasks.
+
+    Workers are started lazily on the first submit, so the queue can be created at import time
+    and only binds to the event loop that the bot is running on.
+    """
+
+    def __init__(self, workers: int, maxsize: int = 0):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.active = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+
+    def submit(self, job: Callable[[], Awaitable]) -> int:
+        """
+        Queue a job to be run by the next free worker.
+
+        :param job: Zero-argument callable returning an awaitable
+        :return: The job's position in the queue, 0 if a worker will pick it up straight away
+        :raises asyncio.QueueFull: If maxsize jobs are already waiting
+        """
+        if self._queue is None:
+            self._start()
+        assert self._queue is not None
+
+        waiting = self._queue.qsize()
+        self._queue.put_nowait(job)
+
+        idle_workers = self.workers - self.active
+        return max(0, waiting + 1 - idle_workers)
+
+    def qsize(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def _start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker(i))
+                       for i in range(self.workers)]
+        log.info(f'started {self.workers} job queue workers')
+
+    async def _worker(self, worker_id: int):
+        assert self._queue is not None
+
+        while True:
+            job = await self._queue.get()
+            self.active += 1
+            try:
+                await job()
+            except Exception:
+                log.exception(f'job failed in worker {worker_id}')
+            finally:
+                self.active -= 1
+                self._queue.task_done()
@@ -0,0 +1,72 @@
+import csv
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from src.config.project_paths import data_dir, merchant_index_path
+
+log = logging.getLogger(__name__)
+
+
+def normalize_merchant(name: str) -> str:
+    """
+    Normalize a transaction name so the same merchant matches across statements.
+
+    Long digit runs (reference numbers, terminal ids, BUS/MRT ids) and punctuation are dropped, e.g.
+    'GRAB*A-12345678 Singapore SG' becomes 'grab a singapore sg'.
+    """
+    name = name.casefold()
+    name = re.sub(r'\d{3,}', ' ', name)
+    name = re.sub(r'[^\w&]+', ' ', name)
+    return ' '.join(name.split())
+
+
+class MerchantIndex:
+    """Maps normalized merchant names to the category they were last given."""
+
+    def __init__(self, path: Path, categories: Optional[dict[str, str]] = None):
+        self.path = path
+        self.categories = categories or {}
+
+    @classmethod
+    def load(cls, path: Path = merchant_index_path, folder_path: Path = data_dir) -> 'MerchantIndex':
+        """Load the index from disk, building it from the transaction CSVs in folder_path the first time."""
+        if path.exists():
+            return cls(path, json.loads(path.read_text()))
+
+        index = cls(path)
+        index.rebuild(folder_path)
+        index.save()
+        return index
+
+    def rebuild(self, folder_path: Path = data_dir):
+        self.categories = {}
+
+        # oldest first, so the most recent category for a merchant wins
+        csv_files = sorted(folder_path.glob('*.csv'), key=os.path.getmtime)
+        for csv_file in csv_files:
+            with open(csv_file, newline='') as f:
+                self.update(csv.DictReader(f))
+
+        log.info(f'built merchant index with {len(self.categories)} merchants from {len(csv_files)} files')
+
+    def update(self, rows):
+        for row in rows:
+            name = normalize_merchant(row.get('name') or '')
+            category = (row.get('category') or '').strip()
+            if name and category:
+                self.categories[name] = category
+
+    def lookup(self, name: str) -> Optional[str]:
+        return self.categories.get(normalize_merchant(name))
+
+    def known_categories(self) -> list[str]:
+        return sorted(set(self.categories.values()))
+
+    def save(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.categories, indent=0, sort_keys=True))
+        os.replace(tmp_path, self.path)
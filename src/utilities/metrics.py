@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+# upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# USD per million input and output tokens, matched by model name prefix
+LLM_PRICES_PER_MTOK = {
+    'claude-3-opus': (15.0, 75.0),
+    'claude-3-5-sonnet': (3.0, 15.0),
+    'claude-3-sonnet': (3.0, 15.0),
+    'claude-3-haiku': (0.25, 1.25),
+}
+
+# the command being handled, used to label the stages timed while handling it
+current_command: ContextVar[str] = ContextVar('current_command', default='none')
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.bucket_counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket containing the q-quantile, inf if it is above the last bucket."""
+        target = q * self.count
+        seen = 0
+        for upper, count in zip(self.buckets, self.bucket_counts):
+            seen += count
+            if seen >= target:
+                return upper
+        return float('inf')
+
+
+def llm_cost(model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+    for prefix, (input_price, output_price) in LLM_PRICES_PER_MTOK.items():
+        if model.startswith(prefix):
+            return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    return None
+
+
+class Metrics:
+    """Per-command stage latencies and LLM token usage, kept in memory for /metrics and the Prometheus endpoint."""
+
+    def __init__(self):
+        self.stage_durations: dict[tuple[str, str], Histogram] = defaultdict(Histogram)
+        self.llm_requests: dict[str, int] = defaultdict(int)
+        self.llm_tokens: dict[tuple[str, str], int] = defaultdict(int)
+        self.llm_cost_usd: dict[str, float] = defaultdict(float)
+
+    def observe_stage(self, command: str, stage: str, seconds: float):
+        self.stage_durations[(command, stage)].observe(seconds)
+
+    def record_llm_usage(self, model: str, usage):
+        """Record the usage of a Messages API response. usage can be None for fake clients."""
+        self.llm_requests[model] += 1
+        if usage is None:
+            return
+
+        self.llm_tokens[(model, 'input')] += usage.input_tokens
+        self.llm_tokens[(model, 'output')] += usage.output_tokens
+
+        cost = llm_cost(model, usage.input_tokens, usage.output_tokens)
+        if cost is not None:
+            self.llm_cost_usd[model] += cost
+
+    def render_prometheus(self) -> str:
+        lines = [
+            '# HELP bot_stage_duration_seconds Time spent in each stage of handling a command.',
+            '# TYPE bot_stage_duration_seconds histogram',
+        ]
+        for (command, stage), histogram in sorted(self.stage_durations.items()):
+            labels = f'command="{command}",stage="{stage}"'
+            cumulative = 0
+            for upper, count in zip(histogram.buckets, histogram.bucket_counts):
+                cumulative += count
+                lines.append(f'bot_stage_duration_seconds_bucket{{{labels},le="{upper}"}} {cumulative}')
+            lines.append(f'bot_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'bot_stage_duration_seconds_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'bot_stage_duration_seconds_count{{{labels}}} {histogram.count}')
+
+        lines += [
+            '# HELP bot_llm_requests_total LLM API requests.',
+            '# TYPE bot_llm_requests_total counter',
+        ]
+        lines += [f'bot_llm_requests_total{{model="{model}"}} {n}' for model, n in sorted(self.llm_requests.items())]
+
+        lines += [
+            '# HELP bot_llm_tokens_total LLM tokens used.',
+            '# TYPE bot_llm_tokens_total counter',
+        ]
+        lines += [f'bot_llm_tokens_total{{model="{model}",type="{kind}"}} {n}'
+                  for (model, kind), n in sorted(self.llm_tokens.items())]
+
+        lines += [
+            '# HELP bot_llm_cost_usd_total Estimated LLM cost in USD.',
+            '# TYPE bot_llm_cost_usd_total counter',
+        ]
+        lines += [f'bot_llm_cost_usd_total{{model="{model}"}} {cost}' for model, cost in sorted(self.llm_cost_usd.items())]
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+        """Human readable summary for the /metrics command."""
+        lines = []
+        for (command, stage), histogram in sorted(self.stage_durations.items()):
+            lines.append(
+                f'{command}/{stage}: {histogram.count} calls, avg {histogram.sum / histogram.count:.3f}s, '
+                f'p50 <= {histogram.quantile(0.5)}s, p95 <= {histogram.quantile(0.95)}s')
+
+        for model, n in sorted(self.llm_requests.items()):
+            lines.append(
+                f'{model}: {n} requests, {self.llm_tokens[(model, "input")]} input tokens, '
+                f'{self.llm_tokens[(model, "output")]} output tokens, ~${self.llm_cost_usd[model]:.4f}')
+
+        return '\n'.join(lines) or 'no metrics recorded yet'
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def stage(name: str):
+    """Time the enclosed block as a stage of the current command."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe_stage(current_command.get(), name, time.perf_counter() - start)
+
+
+@contextmanager
+def command_context(command: str):
+    """Label the stages timed in the enclosed block with command, e.g. for work done outside a handler."""
+    token = current_command.set(command)
+    try:
+        yield
+    finally:
+        current_command.reset(token)
+
+
+def instrument(command: str, handler):
+    """Wrap a telegram handler so its total latency and the stages inside it are recorded under command."""
+    @wraps(handler)
+    async def wrapper(update, context):
+        with command_context(command), stage('total'):
+            return await handler(update, context)
+
+    return wrapper
+
+
+async def _handle_metrics_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+
+        path = request_line.split()[1] if len(request_line.split()) > 1 else b''
+        if path == b'/metrics':
+            status, body = '200 OK', metrics.render_prometheus()
+        else:
+            status, body = '404 Not Found', 'not found\n'
+
+        payload = body.encode()
+        writer.write(
+            f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n'
+            f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode() + payload)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.AbstractServer:
+    """Serve the metrics in the Prometheus text format at http://host:port/metrics."""
+    server = await asyncio.start_server(_handle_metrics_request, host, port)
+    log.info(f'serving metrics on http://{host}:{port}/metrics')
+    return server
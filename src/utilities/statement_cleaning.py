@@ -0,0 +1,153 @@
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+# lines that are part of the transaction table, which are never dropped as repeated headers or footers
+DATA_LINE_PATTERN = re.compile(r'^(\d{1,2} [A-Za-z]{3}( \d{4})?|-?\$?[\d,]+\.\d{2}( CR)?)$')
+
+WHITESPACE_PATTERN = re.compile(r'[ \t\u00a0]+')
+
+
+def literal_pattern(text: str) -> str:
+    """Regex matching text literally, but with any run of whitespace and any bullet character between words."""
+    words = re.split(r'\s+', text.strip())
+    return r'\s+'.join(re.escape(word) for word in words).replace(re.escape('•'), '[•·]')
+
+
+@dataclass
+class CleaningProfile:
+    """How to clean the statements of one bank before they are sent to the LLM."""
+    name: str
+    # the profile is used for statements whose first page matches this
+    detect: re.Pattern
+    # removed from every page, e.g. disclaimers and sections that aren't transactions
+    remove: list[re.Pattern] = field(default_factory=list)
+
+
+UOB_PROFILE = CleaningProfile(
+    name='uob',
+    detect=re.compile(r'United Overseas Bank|\bUOB\b'),
+    remove=[
+        re.compile(literal_pattern(
+            'Please note that you are bound by a duty under the rules governing the operation of this account, to check '
+            'the entries in the above statement. If you do not notify us in writing of any errors, omissions or unauthorised '
+            'debits within fourteen (14) days of this statement, the entries above shall be deemed valid, correct, accurate '
+            'and conclusively binding upon you, and you shall have no claim against the bank in relation thereto.'),
+            flags=re.IGNORECASE),
+        re.compile(r'请注意，在此户口的管理条规下.*?您不得向本行索取赔偿\.', flags=re.DOTALL),
+        re.compile(literal_pattern(
+            'United Overseas Bank Limited • 80 Raffles Place UOB Plaza Singapore 048624 • Co. Reg. No. 193500026Z • '
+            'GST Reg. No. MR-8500194-3 • www.uob.com.sg'), flags=re.IGNORECASE),
+        # running balances, which the model would otherwise read as transactions
+        re.compile(r'^(PREVIOUS BALANCE|SUB TOTAL|TOTAL BALANCE FOR .*)\n([\d,]+\.\d{2}( CR)?\n)?', flags=re.MULTILINE),
+    ],
+)
+
+GENERIC_PROFILE = CleaningProfile(name='generic', detect=re.compile(''))
+
+# statements are cleaned with the first profile that detects them
+CLEANING_PROFILES = [UOB_PROFILE, GENERIC_PROFILE]
+
+
+@dataclass
+class CleaningReport:
+    profile: str
+    chars_before: int
+    chars_after: int
+    repeated_lines_dropped: int
+
+    @property
+    def tokens_before(self) -> int:
+        return estimate_tokens(self.chars_before)
+
+    @property
+    def tokens_after(self) -> int:
+        return estimate_tokens(self.chars_after)
+
+
+def estimate_tokens(n_chars: int) -> int:
+    """Rough token count of n_chars of statement text, at about 3.5 characters per token."""
+    return round(n_chars / 3.5)
+
+
+def collapse_whitespace(text: str) -> str:
+    """Collapse runs of spaces within lines and drop empty lines."""
+    lines = (WHITESPACE_PATTERN.sub(' ', line).strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def edge_lines(lines: list[str]) -> set[int]:
+    """Indexes of the lines before the first and after the last line of the transaction table."""
+    data_indexes = [i for i, line in enumerate(lines) if DATA_LINE_PATTERN.match(line)]
+    if not data_indexes:
+        return set()
+    return set(range(data_indexes[0])) | set(range(data_indexes[-1] + 1, len(lines)))
+
+
+def repeated_line_key(line: str) -> str:
+    # page numbers and dates change between pages, e.g. "Page 2 of 5"
+    return re.sub(r'\d+', '#', line)
+
+
+def drop_repeated_lines(pages: list[list[str]]) -> tuple[list[list[str]], int]:
+    """
+    Drop the header and footer lines repeated on every page, keeping them on the first page only.
+
+    Only lines above or below a page's transaction table count as headers and footers, so
+    transactions that happen to appear on every page are kept.
+    """
+    if len(pages) < 2:
+        return pages, 0
+
+    page_edges = [edge_lines(lines) for lines in pages]
+    counts = Counter()
+    for lines, edges in zip(pages, page_edges):
+        counts.update({repeated_line_key(lines[i]) for i in edges})
+
+    repeated = {key for key, count in counts.items() if count == len(pages)}
+
+    dropped = 0
+    cleaned = [pages[0]]
+    for lines, edges in zip(pages[1:], page_edges[1:]):
+        kept = [line for i, line in enumerate(lines) if i not in edges or repeated_line_key(line) not in repeated]
+        dropped += len(lines) - len(kept)
+        cleaned.append(kept)
+
+    return cleaned, dropped
+
+
+def detect_profile(first_page: str) -> CleaningProfile:
+    return next(profile for profile in CLEANING_PROFILES if profile.detect.search(first_page))
+
+
+def clean_statement_pages(pages: list[str], profile: Optional[CleaningProfile] = None) -> tuple[list[str], CleaningReport]:
+    """
+    Shrink the text of a statement before it is sent to the LLM.
+
+    Removes the profile's disclaimers and non-transaction sections, collapses whitespace, and drops
+    the headers and footers repeated on every page.
+
+    :param pages: Text of each transaction page
+    :param profile: Cleaning profile of the bank, detected from the first page by default
+    :return: The cleaned pages, and how much they shrank
+    """
+    profile = profile or detect_profile(pages[0] if pages else '')
+    chars_before = sum(len(page) for page in pages)
+
+    for pattern in profile.remove:
+        pages = [pattern.sub('', page) for page in pages]
+
+    lines, dropped = drop_repeated_lines([collapse_whitespace(page).splitlines() for page in pages])
+    cleaned = ['\n'.join(page_lines) for page_lines in lines]
+
+    report = CleaningReport(
+        profile=profile.name,
+        chars_before=chars_before,
+        chars_after=sum(len(page) for page in cleaned),
+        repeated_lines_dropped=dropped,
+    )
+    return cleaned, report
@@ -0,0 +1,34 @@
+import logging
+import time
+
+from telegram import Message
+from telegram.error import TelegramError
+
+log = logging.getLogger(__name__)
+
+
+class StatusMessage:
+    """
+    A Telegram message that is edited in place to show progress.
+
+    Edits are throttled to one every min_interval seconds to stay clear of Telegram's rate limits.
+    """
+
+    def __init__(self, message: Message, min_interval: float = 3.0):
+        self.message = message
+        self.min_interval = min_interval
+        self._text = message.text
+        self._last_edit = 0.0
+
+    async def update(self, text: str, force: bool = False):
+        """Edit the message to text, unless the last edit was too recent (and force is False)."""
+        now = time.monotonic()
+        if text == self._text or (not force and now - self._last_edit < self.min_interval):
+            return
+
+        self._text = text
+        self._last_edit = now
+        try:
+            await self.message.edit_text(text)
+        except TelegramError as e:
+            log.warning(f'Failed to update status message: {e}')
@@ -114,33 +114,31 @@ def sort_csv_by_price_to_telegram_html(csv_content: str):
     data = list(reader)
     data.sort(key=lambda x: safe_float(x.get('price', 0) or 0), reverse=True)
 
-    indexed_data = []
+    return transactions_to_telegram_html(data)
 
-    idx = 1
-    for i in data:
-        d = {}
-        d['index'] = idx
-        for k, v in i.items():
-            d[k] = v
-        indexed_data.append(d)
-        idx += 1
 
-    # Generate Telegram-compatible HTML
-    html_output = '<pre>\n'
+def transactions_to_telegram_html(rows: list[dict], start_index: int = 1):
+    """
+    Render transaction rows as a Telegram-compatible HTML table, numbering them from start_index.
+
+    :param rows: Rows with the same keys, e.g. date, name, price, category
+    :param start_index: Number of the first row, so that later pages continue the numbering
+    """
+    if not rows:
+        return '<pre>\n</pre>'
 
     # Add header row
-    headers = list(indexed_data[0].keys())
+    headers = ['index'] + list(rows[0].keys())
     header_row = ' | '.join(
         f'<b>{html.escape(header)}</b>' for header in headers)
-    html_output += f'{header_row}\n'
-    html_output += '-' * \
-        len(header_row.replace('<b>', '').replace('</b>', '')) + '\n'
+
+    lines = ['<pre>', header_row, '-' * len(' | '.join(headers))]
 
     # Add data rows
-    for row in indexed_data:
-        row_values = [html.escape(str(row[header])) for header in headers]
-        html_output += ' | '.join(row_values) + '\n'
+    for idx, row in enumerate(rows, start_index):
+        row_values = [str(idx)] + [html.escape(str(v)) for v in row.values()]
+        lines.append(' | '.join(row_values))
 
-    html_output += '</pre>'
+    lines.append('</pre>')
 
-    return html_output
+    return '\n'.join(lines)
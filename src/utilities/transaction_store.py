@@ -0,0 +1,554 @@
+import csv
+import logging
+import sqlite3
+from contextlib import closing, contextmanager
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from src.config.project_paths import cc_statement_dir, data_dir
+from src.utilities.data_utilities import (
+    CSV_COLUMNS,
+    cents_to_price,
+    dedup_keys,
+    file_sha256,
+    safe_cents,
+    to_transaction_frame,
+)
+from src.utilities.dataframe_cache import dataframe_cache
+from src.utilities.date_range_index import DateRangeIndex
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    statement TEXT NOT NULL,
+    date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+CREATE INDEX IF NOT EXISTS transactions_statement ON transactions (statement);
+CREATE INDEX IF NOT EXISTS transactions_price ON transactions (price_cents);
+CREATE INDEX IF NOT EXISTS transactions_statement_price ON transactions (statement, price_cents);
+
+-- per-month totals and counts for every (category, merchant), maintained by add_statement
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    month TEXT NOT NULL,
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (month, category, name)
+);
+
+-- one row per ingested statement, so the latest statement and the list of statements are indexed reads
+CREATE TABLE IF NOT EXISTS statements (
+    statement TEXT PRIMARY KEY,
+    source_pdf TEXT,
+    csv_path TEXT,
+    period_start TEXT,
+    period_end TEXT,
+    row_count INTEGER NOT NULL,
+    total_cents INTEGER NOT NULL,
+    content_hash TEXT,
+    ingested_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS statements_period_end ON statements (period_end);
+CREATE INDEX IF NOT EXISTS statements_content_hash ON statements (content_hash);
+
+-- dedup index of every stored transaction by its dedup_keys key, so a transaction is only stored once
+-- however many statements it appears in
+CREATE TABLE IF NOT EXISTS transaction_keys (
+    key TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    statement TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transaction_keys_date ON transaction_keys (date);
+CREATE INDEX IF NOT EXISTS transaction_keys_statement ON transaction_keys (statement);
+
+-- rows of a statement that weren't stored, because the statement in duplicate_of already had them
+CREATE TABLE IF NOT EXISTS duplicate_transactions (
+    id INTEGER PRIMARY KEY,
+    statement TEXT NOT NULL,
+    date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    duplicate_of TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS duplicate_transactions_statement ON duplicate_transactions (statement);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# prices used to be stored as REAL dollars, whose sums drift by fractions of a cent. Stores created before
+# they were stored as integer cents have these (table: (dollar column, cents column)) converted on open
+CENTS_COLUMNS = {
+    'transactions': ('price', 'price_cents'),
+    'monthly_rollups': ('total', 'total_cents'),
+    'statements': ('total', 'total_cents'),
+    'duplicate_transactions': ('price', 'price_cents'),
+}
+
+# transaction dates are written to the CSVs in this format, and stored as ISO dates so they sort correctly
+CSV_DATE_FORMAT = '%d %b %Y'
+
+
+def to_csv_row(row: sqlite3.Row) -> dict:
+    return {
+        'date': datetime.strptime(row['date'], '%Y-%m-%d').strftime(CSV_DATE_FORMAT),
+        'name': row['name'],
+        'price': f"{cents_to_price(row['price_cents']):.2f}",
+        'category': row['category'],
+    }
+
+
+class TransactionStore:
+    """
+    SQLite file holding every ingested transaction, so commands don't have to re-read and re-parse the CSVs.
+
+    Each statement's rows are tagged with the statement name (the CSV file stem), and re-adding a
+    statement replaces its rows. Every write bumps data_version, which invalidates the DataFrames
+    cached by read_transactions.
+
+    Monthly rollups of the transactions are updated on every write, for the months the write touched,
+    so month-level stats never have to scan the raw rows. The statements table is a manifest of every
+    ingested statement with its source PDF, period, row count, total and content hash.
+
+    Transactions already stored from another statement, e.g. by an overlapping statement or a
+    re-export, are dropped by add_statement and recorded in duplicate_transactions instead.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._initialized = False
+        self._date_range_index: Optional[tuple[int, Optional[DateRangeIndex]]] = None
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.row_factory = sqlite3.Row
+
+            if not self._initialized:
+                self._migrate_to_cents(conn)
+                conn.executescript(SCHEMA)
+                with conn:
+                    self._migrate(conn)
+                self._initialized = True
+
+            with conn:
+                yield conn
+
+    @staticmethod
+    def _columns(conn: sqlite3.Connection, table: str) -> list[str]:
+        return [r['name'] for r in conn.execute(f'PRAGMA table_info({table})')]
+
+    def _migrate_to_cents(self, conn: sqlite3.Connection):
+        """Convert the dollar columns of a store created before prices were stored in cents, see CENTS_COLUMNS."""
+        tables = [table for table, (column, _) in CENTS_COLUMNS.items() if column in self._columns(conn, table)]
+        if not tables:
+            return
+
+        # SQLite can't change the type of a column, so the tables are recreated, all in one transaction
+        conn.execute('BEGIN')
+        for table in tables:
+            conn.execute(f'ALTER TABLE {table} RENAME TO {table}_dollars')
+            indexes = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (f'{table}_dollars',)).fetchall()
+            for index in indexes:
+                conn.execute(f"DROP INDEX {index['name']}")
+
+        for statement in SCHEMA.split(';'):
+            if statement.strip():
+                conn.execute(statement)
+
+        for table in tables:
+            column, cents_column = CENTS_COLUMNS[table]
+            columns = self._columns(conn, f'{table}_dollars')
+            conn.execute(
+                f"INSERT INTO {table} ({', '.join(cents_column if c == column else c for c in columns)}) "
+                f"SELECT {', '.join(f'CAST(ROUND({c} * 100) AS INTEGER)' if c == column else c for c in columns)} "
+                f'FROM {table}_dollars')
+            conn.execute(f'DROP TABLE {table}_dollars')
+
+        self._bump_data_version(conn)
+        conn.commit()
+        log.warning(f'converted the prices of {self.db_path} to cents')
+
+    def _migrate(self, conn: sqlite3.Connection):
+        """Fill in tables added after the store was created from the transactions already in it."""
+        has_transactions = conn.execute(
+            'SELECT EXISTS (SELECT 1 FROM transactions)').fetchone()[0]
+        if not has_transactions:
+            return
+
+        if not conn.execute('SELECT EXISTS (SELECT 1 FROM transaction_keys)').fetchone()[0]:
+            self._index_transactions(conn)
+
+        if not conn.execute('SELECT EXISTS (SELECT 1 FROM monthly_rollups)').fetchone()[0]:
+            self._update_rollups(conn, self._months(conn))
+
+        conn.execute(
+            'INSERT OR IGNORE INTO statements (statement, period_start, period_end, row_count, total_cents, ingested_at) '
+            'SELECT statement, MIN(date), MAX(date), COUNT(*), SUM(price_cents), ? FROM transactions GROUP BY statement',
+            (datetime.now().isoformat(timespec='seconds'),))
+
+    def _index_transactions(self, conn: sqlite3.Connection):
+        """Build the dedup index of transactions stored before it existed, removing the duplicates among them."""
+        transactions = conn.execute(
+            'SELECT t.id, t.statement, t.date, t.name, t.price_cents FROM transactions t '
+            'LEFT JOIN statements s USING (statement) ORDER BY s.ingested_at, t.statement, t.id').fetchall()
+
+        duplicate_ids = []
+        for statement, statement_transactions in groupby(transactions, key=lambda r: r['statement']):
+            statement_transactions = list(statement_transactions)
+            keys, duplicates = self._find_duplicates(
+                conn, statement, [(r['date'], r['name'], r['price_cents'], '') for r in statement_transactions])
+
+            self._record_duplicates(conn, statement, [
+                (statement_transactions[i]['date'], statement_transactions[i]['name'], statement_transactions[i]['price_cents'], duplicate_of)
+                for i, duplicate_of in duplicates.items()])
+            duplicate_ids += [statement_transactions[i]['id'] for i in duplicates]
+            self._insert_keys(conn, statement, [
+                (key, r['date']) for i, (key, r) in enumerate(zip(keys, statement_transactions)) if i not in duplicates])
+
+        conn.executemany('DELETE FROM transactions WHERE id = ?', [(i,) for i in duplicate_ids])
+        if duplicate_ids:
+            # the rollups and statement totals are rebuilt without the duplicates
+            conn.execute('DELETE FROM monthly_rollups')
+            conn.execute(
+                'UPDATE statements SET row_count = (SELECT COUNT(*) FROM transactions t WHERE t.statement = statements.statement), '
+                'total_cents = (SELECT COALESCE(SUM(price_cents), 0) FROM transactions t WHERE t.statement = statements.statement)')
+            self._bump_data_version(conn)
+            log.warning(f'removed {len(duplicate_ids)} duplicate transactions from {self.db_path}')
+
+    def _find_duplicates(self, conn: sqlite3.Connection, statement: str, transactions: list[tuple]) -> tuple[list[str], dict[int, str]]:
+        """
+        Check the transactions of a statement against the dedup index.
+
+        :param transactions: (ISO date, name, price in cents, card) of each transaction
+        :return: The dedup key of each transaction, and the indexes of the ones another statement already has,
+            mapped to that statement
+        """
+        keys = dedup_keys((date, name, cents_to_price(cents), card) for date, name, cents, card in transactions)
+        if not keys:
+            return keys, {}
+
+        # only the keys in the statement's period can match, and they are few enough to check in a dict
+        dates = [transaction[0] for transaction in transactions]
+        stored = dict(conn.execute(
+            'SELECT key, statement FROM transaction_keys WHERE date >= ? AND date <= ? AND statement != ?',
+            (min(dates), max(dates), statement)).fetchall())
+
+        return keys, {i: stored[key] for i, key in enumerate(keys) if key in stored}
+
+    def _insert_keys(self, conn: sqlite3.Connection, statement: str, keys: list[tuple[str, str]]):
+        conn.executemany(
+            'INSERT OR REPLACE INTO transaction_keys (key, date, statement) VALUES (?, ?, ?)',
+            [(key, date, statement) for key, date in keys])
+
+    def _record_duplicates(self, conn: sqlite3.Connection, statement: str, duplicates: list[tuple]):
+        conn.executemany(
+            'INSERT INTO duplicate_transactions (statement, date, name, price_cents, duplicate_of) VALUES (?, ?, ?, ?, ?)',
+            [(statement, *duplicate) for duplicate in duplicates])
+        if duplicates:
+            log.info(f'dropped {len(duplicates)} transactions of {statement} already stored from other statements')
+
+    def add_statement(self, statement: str, rows: list[dict], source_pdf: Optional[Path] = None,
+                      csv_path: Optional[Path] = None, content_hash: Optional[str] = None) -> int:
+        """
+        Replace the stored rows of a statement, and record it in the statements manifest.
+
+        :param statement: Name of the statement, i.e. the stem of its CSV file
+        :param rows: Rows with the CSV_COLUMNS keys
+        :param source_pdf: The statement PDF the rows were extracted from
+        :param csv_path: Where the rows were saved as CSV
+        :param content_hash: Hash of the source PDF, see file_sha256
+        :return: Number of rows stored, rows with an unparseable date or already stored from another statement are skipped
+        """
+        records = []
+        cards = []
+        for row in rows:
+            try:
+                date = datetime.strptime(row['date'].strip(), CSV_DATE_FORMAT)
+            except (ValueError, AttributeError):
+                log.warning(f'Skipping row with invalid date in {statement}: {row}')
+                continue
+
+            records.append((
+                statement,
+                date.strftime('%Y-%m-%d'),
+                row['name'],
+                safe_cents(row['price']),
+                row.get('category') or '',
+            ))
+            cards.append(row.get('card') or '')
+
+        with self.connect() as conn:
+            months = {r['month'] for r in conn.execute(
+                'SELECT DISTINCT substr(date, 1, 7) AS month FROM transactions WHERE statement = ?', (statement,))}
+            months.update(record[1][:7] for record in records)
+
+            conn.execute(
+                'DELETE FROM transactions WHERE statement = ?', (statement,))
+            conn.execute(
+                'DELETE FROM transaction_keys WHERE statement = ?', (statement,))
+            conn.execute(
+                'DELETE FROM duplicate_transactions WHERE statement = ?', (statement,))
+
+            keys, duplicates = self._find_duplicates(
+                conn, statement, [(record[1], record[2], record[3], card) for record, card in zip(records, cards)])
+            self._record_duplicates(conn, statement, [
+                (*records[i][1:4], duplicate_of) for i, duplicate_of in duplicates.items()])
+            self._insert_keys(conn, statement, [
+                (key, record[1]) for i, (key, record) in enumerate(zip(keys, records)) if i not in duplicates])
+            records = [record for i, record in enumerate(records) if i not in duplicates]
+
+            conn.executemany(
+                'INSERT INTO transactions (statement, date, name, price_cents, category) VALUES (?, ?, ?, ?, ?)',
+                records)
+            self._update_rollups(conn, months)
+
+            dates = [record[1] for record in records]
+            conn.execute(
+                'INSERT OR REPLACE INTO statements '
+                '(statement, source_pdf, csv_path, period_start, period_end, row_count, total_cents, content_hash, ingested_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    statement,
+                    str(source_pdf) if source_pdf else None,
+                    str(csv_path) if csv_path else None,
+                    min(dates, default=None),
+                    max(dates, default=None),
+                    len(records),
+                    sum(record[3] for record in records),
+                    content_hash,
+                    datetime.now().isoformat(timespec='seconds'),
+                ))
+            self._bump_data_version(conn)
+
+        log.info(f'stored {len(records)} transactions for {statement}')
+        return len(records)
+
+    def _update_rollups(self, conn: sqlite3.Connection, months):
+        """Recompute the rollups of the given YYYY-MM months from their transactions."""
+        for month in months:
+            conn.execute(
+                'DELETE FROM monthly_rollups WHERE month = ?', (month,))
+            conn.execute(
+                'INSERT INTO monthly_rollups (month, category, name, total_cents, count) '
+                'SELECT ?, category, name, SUM(price_cents), COUNT(*) FROM transactions '
+                'WHERE date >= ? AND date < ? GROUP BY category, name',
+                (month, f'{month}-01', f'{month}-32'))
+
+    def _months(self, conn: sqlite3.Connection) -> list[str]:
+        return [r['month'] for r in conn.execute(
+            'SELECT DISTINCT substr(date, 1, 7) AS month FROM transactions')]
+
+    def rebuild_rollups(self):
+        with self.connect() as conn:
+            conn.execute('DELETE FROM monthly_rollups')
+            months = self._months(conn)
+            self._update_rollups(conn, months)
+
+        log.info(f'rebuilt monthly rollups for {len(months)} months')
+
+    def monthly_totals(self) -> dict[str, int]:
+        """Total cents spent in each YYYY-MM month."""
+        with self.connect() as conn:
+            return {r['month']: r['total_cents'] for r in conn.execute(
+                'SELECT month, SUM(total_cents) AS total_cents FROM monthly_rollups GROUP BY month ORDER BY month')}
+
+    def category_totals(self, months: list[str]) -> dict[str, int]:
+        """Total cents spent in each category in the given months."""
+        placeholders = ', '.join('?' * len(months))
+        with self.connect() as conn:
+            return {r['category']: r['total_cents'] for r in conn.execute(
+                f'SELECT category, SUM(total_cents) AS total_cents FROM monthly_rollups WHERE month IN ({placeholders}) '
+                'GROUP BY category ORDER BY category', months)}
+
+    def merchant_totals(self, months: list[str]) -> list[sqlite3.Row]:
+        """Rows of (name, total_cents, count) for each merchant in the given months, ordered by name."""
+        placeholders = ', '.join('?' * len(months))
+        with self.connect() as conn:
+            return conn.execute(
+                f'SELECT name, SUM(total_cents) AS total_cents, SUM(count) AS count FROM monthly_rollups WHERE month IN ({placeholders}) '
+                'GROUP BY name ORDER BY name', months).fetchall()
+
+    def last_date(self) -> Optional[str]:
+        with self.connect() as conn:
+            return conn.execute('SELECT MAX(date) FROM transactions').fetchone()[0]
+
+    def top_prices(self, n: int) -> list[int]:
+        """The n highest prices, in cents."""
+        with self.connect() as conn:
+            return [r['price_cents'] for r in conn.execute(
+                'SELECT price_cents FROM transactions ORDER BY price_cents DESC LIMIT ?', (n,))]
+
+    def _bump_data_version(self, conn: sqlite3.Connection):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('data_version', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+
+    def data_version(self) -> int:
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+        return row['value'] if row else 0
+
+    def import_csvs(self, folder_path: Path = data_dir, pdf_folder_path: Path = cc_statement_dir) -> dict[str, int]:
+        """
+        Add every transaction CSV in folder_path to the store, returning the number of rows stored per statement.
+
+        Statement PDFs with the same name in pdf_folder_path are recorded as the source of each CSV.
+        """
+        imported = {}
+        for csv_file in sorted(folder_path.glob('*.csv')):
+            with open(csv_file, newline='') as f:
+                rows = list(csv.DictReader(f))
+
+            if not rows or not all(col in rows[0] for col in CSV_COLUMNS):
+                log.warning(f"Skipping {csv_file.name}: Missing required columns")
+                continue
+
+            source_pdf = pdf_folder_path / f'{csv_file.stem}.pdf'
+            if not source_pdf.exists():
+                source_pdf = None
+
+            imported[csv_file.stem] = self.add_statement(
+                csv_file.stem, rows, source_pdf=source_pdf, csv_path=csv_file,
+                content_hash=file_sha256(source_pdf) if source_pdf else None)
+
+        return imported
+
+    def statements(self) -> list[sqlite3.Row]:
+        """Manifest rows of every statement, ordered by the date of their last transaction."""
+        with self.connect() as conn:
+            return conn.execute('SELECT * FROM statements ORDER BY period_end, ingested_at').fetchall()
+
+    def latest_statement(self) -> Optional[str]:
+        """The statement with the most recent last transaction."""
+        with self.connect() as conn:
+            row = conn.execute(
+                'SELECT statement FROM statements ORDER BY period_end DESC, ingested_at DESC LIMIT 1').fetchone()
+        return row['statement'] if row else None
+
+    def find_statement_by_hash(self, content_hash: str) -> Optional[str]:
+        with self.connect() as conn:
+            row = conn.execute(
+                'SELECT statement FROM statements WHERE content_hash = ? LIMIT 1', (content_hash,)).fetchone()
+        return row['statement'] if row else None
+
+    def duplicates(self, statement: Optional[str] = None) -> list[sqlite3.Row]:
+        """Rows dropped as duplicates of another statement's, optionally only those of one statement."""
+        where, params = ('WHERE statement = ?', (statement,)) if statement else ('', ())
+        with self.connect() as conn:
+            return conn.execute(
+                f'SELECT statement, date, name, price_cents, duplicate_of FROM duplicate_transactions {where} '
+                'ORDER BY statement, date, id', params).fetchall()
+
+    def statement_rows(self, statement: str) -> list[dict]:
+        """Rows of a statement in the same shape and date format as its CSV file."""
+        with self.connect() as conn:
+            cursor = conn.execute(
+                'SELECT date, name, price_cents, category FROM transactions WHERE statement = ? ORDER BY id', (statement,))
+            return [to_csv_row(r) for r in cursor]
+
+    @staticmethod
+    def _filter_clause(statement: Optional[str] = None, month: Optional[str] = None,
+                       category: Optional[str] = None) -> tuple[str, list]:
+        conditions = []
+        params = []
+        if statement:
+            conditions.append('statement = ?')
+            params.append(statement)
+        if month:
+            conditions.append('date >= ? AND date < ?')
+            params += [f'{month}-01', f'{month}-32']
+        if category:
+            conditions.append('category = ? COLLATE NOCASE')
+            params.append(category)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return where, params
+
+    def transactions_by_price(self, statement: Optional[str] = None, month: Optional[str] = None,
+                              category: Optional[str] = None, offset: int = 0, limit: int = -1) -> list[dict]:
+        """
+        A page of transactions, most expensive first, optionally filtered by statement, YYYY-MM month and category.
+
+        Rows are in the same shape and date format as the CSV files.
+        """
+        where, params = self._filter_clause(statement, month, category)
+        with self.connect() as conn:
+            cursor = conn.execute(
+                f'SELECT date, name, price_cents, category FROM transactions {where} '
+                'ORDER BY price_cents DESC, id LIMIT ? OFFSET ?', params + [limit, offset])
+            return [to_csv_row(r) for r in cursor]
+
+    def count_transactions(self, statement: Optional[str] = None, month: Optional[str] = None,
+                           category: Optional[str] = None) -> tuple[int, int]:
+        """Number and total cents of the transactions matching the filters of transactions_by_price."""
+        where, params = self._filter_clause(statement, month, category)
+        with self.connect() as conn:
+            row = conn.execute(
+                f'SELECT COUNT(*), COALESCE(SUM(price_cents), 0) FROM transactions {where}', params).fetchone()
+        return row[0], row[1]
+
+    def read_transactions(self, latest_only=False) -> Optional['pd.DataFrame']:
+        """
+        Load transactions into a DataFrame with the TRANSACTION_DTYPES columns, like read_transaction_csvs.
+
+        The result is served from dataframe_cache until the next write to the store.
+
+        :param latest_only: Only load the rows of the latest statement
+        :return: DataFrame sorted by date, or None if the store is empty
+        """
+        return dataframe_cache.get_or_load(
+            ('store', str(self.db_path), latest_only),
+            self.data_version(),
+            lambda: self._load_transactions(latest_only))
+
+    def date_range_index(self) -> Optional[DateRangeIndex]:
+        """
+        DateRangeIndex of all transactions, rebuilt after the next write to the store.
+
+        :return: The index, or None if the store is empty
+        """
+        version = self.data_version()
+        if self._date_range_index is None or self._date_range_index[0] != version:
+            df = self.read_transactions()
+            self._date_range_index = (version, DateRangeIndex(df) if df is not None else None)
+        return self._date_range_index[1]
+
+    def _load_transactions(self, latest_only=False) -> Optional['pd.DataFrame']:
+        import pandas as pd
+
+        query = 'SELECT date, name, price_cents, category FROM transactions'
+        params = ()
+        if latest_only:
+            query += ' WHERE statement = ?'
+            params = (self.latest_statement(),)
+        query += ' ORDER BY date, id'
+
+        with self.connect() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
+
+        if df.empty:
+            return None
+
+        df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d')
+        return to_transaction_frame(df)
+
@@ -0,0 +1,83 @@
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from telegram import Update
+
+from src.config.project_paths import docker_volume_dir, users_dir
+from src.config.project_settings import (
+    LEGACY_DATA_CHAT_ID,
+    MAX_OPEN_USERS,
+    USER_MAX_STATEMENTS,
+    USER_MAX_STORAGE_BYTES,
+)
+from src.utilities.merchant_index import MerchantIndex
+from src.utilities.transaction_store import TransactionStore
+
+log = logging.getLogger(__name__)
+
+
+class UserData:
+    """
+    The statements, CSVs, transaction store and merchant index of one chat.
+
+    Every chat gets its own directory, so commands only ever read the data of the chat they were sent from.
+    """
+
+    def __init__(self, chat_id: int, root: Path):
+        self.chat_id = chat_id
+        self.root = root
+        self.cc_statement_dir = root / 'cc_statements'
+        self.data_dir = root / 'data'
+        self.merchant_index_path = root / 'merchant_categories.json'
+        self.store = TransactionStore(root / 'transactions.sqlite3')
+        self._merchant_index: Optional[MerchantIndex] = None
+
+        self.cc_statement_dir.mkdir(parents=True, exist_ok=True)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def merchant_index(self) -> MerchantIndex:
+        if self._merchant_index is None:
+            self._merchant_index = MerchantIndex.load(self.merchant_index_path, self.data_dir)
+        return self._merchant_index
+
+    def storage_bytes(self) -> int:
+        files = [*self.cc_statement_dir.iterdir(), *self.data_dir.iterdir(), self.store.db_path]
+        return sum(path.stat().st_size for path in files if path.is_file())
+
+    def quota_error(self, new_bytes: int = 0, new_statements: int = 1) -> Optional[str]:
+        """Why new_statements more statements, of new_bytes in total, can't be stored for this chat, or None if they can."""
+        if USER_MAX_STATEMENTS and len(self.store.statements()) + new_statements > USER_MAX_STATEMENTS:
+            return f'You have reached the limit of {USER_MAX_STATEMENTS} statements.'
+
+        if USER_MAX_STORAGE_BYTES and self.storage_bytes() + new_bytes > USER_MAX_STORAGE_BYTES:
+            return f'You have reached the storage limit of {USER_MAX_STORAGE_BYTES // (1024 * 1024)} MB.'
+
+        return None
+
+
+def user_data_root(chat_id: int) -> Path:
+    if LEGACY_DATA_CHAT_ID and str(chat_id) == str(LEGACY_DATA_CHAT_ID):
+        return docker_volume_dir
+    return users_dir / str(chat_id)
+
+
+_open_users: OrderedDict[int, UserData] = OrderedDict()
+
+
+def get_user_data(chat_id: int) -> UserData:
+    """The data of a chat, keeping the MAX_OPEN_USERS most recently used open."""
+    user = _open_users.pop(chat_id, None) or UserData(chat_id, user_data_root(chat_id))
+    _open_users[chat_id] = user
+
+    while len(_open_users) > MAX_OPEN_USERS:
+        _open_users.popitem(last=False)
+
+    return user
+
+
+def get_update_user_data(update: Update) -> UserData:
+    assert update.effective_chat, 'update.effective_chat was None'
+    return get_user_data(update.effective_chat.id)
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from telegram import Update
+from telegram.ext import Application
+
+from src.config.project_secrets import TELEGRAM_BOT_TOKEN
+from src.config.project_settings import (
+    TELEGRAM_BASE_URL,
+    WEBHOOK_HOST,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_URL,
+    WEBHOOK_WORKERS,
+)
+from src.utilities.image_utilities import shutdown_process_pool
+
+log = logging.getLogger(__name__)
+
+# builds the bot's Application for worker n, without an updater
+ApplicationFactory = Callable[[int], Application]
+
+
+def update_chat_id(update: dict) -> int:
+    """Id of the chat an update belongs to, or of the user for updates without a chat. 0 if it has neither."""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+
+        chat = value.get('chat') or (value.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+        if value.get('from'):
+            return value['from']['id']
+
+    return 0
+
+
+def run_worker(worker: int, updates: multiprocessing.Queue, build_application: ApplicationFactory):
+    try:
+        asyncio.run(serve_updates(worker, updates, build_application))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # a child process waits for its own children before exiting, which the pool's workers never do by themselves
+        shutdown_process_pool()
+
+
+async def serve_updates(worker: int, updates: multiprocessing.Queue, build_application: ApplicationFactory):
+    """Feed the updates sent to this worker into its Application, until None is received."""
+    application = build_application(worker)
+    loop = asyncio.get_running_loop()
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        log.info(f'webhook worker {worker} started')
+
+        while True:
+            data = await loop.run_in_executor(None, updates.get)
+            if data is None:
+                break
+
+            # the application handles its update_queue one update at a time, like when polling
+            await application.update_queue.put(Update.de_json(data, application.bot))
+
+        await application.stop()
+
+
+def make_request_handler(worker_queues: list[multiprocessing.Queue]) -> type[BaseHTTPRequestHandler]:
+    class WebhookRequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != WEBHOOK_PATH:
+                self.send_error(404)
+                return
+
+            if WEBHOOK_SECRET_TOKEN and self.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET_TOKEN:
+                self.send_error(403)
+                return
+
+            try:
+                data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            except ValueError:
+                self.send_error(400)
+                return
+
+            # updates of a chat always go to the same worker, so they are handled in the order they arrive
+            worker_queue = worker_queues[update_chat_id(data) % len(worker_queues)]
+            try:
+                worker_queue.put(data, timeout=5)
+            except queue.Full:
+                # Telegram retries updates that weren't acknowledged
+                self.send_error(503)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            log.debug(format % args)
+
+    return WebhookRequestHandler
+
+
+def set_webhook(url: str, secret_token: Optional[str] = None):
+    """Register the webhook URL with the Bot API."""
+    params = {'url': url}
+    if secret_token:
+        params['secret_token'] = secret_token
+
+    request = urllib.request.Request(
+        f'{TELEGRAM_BASE_URL}{TELEGRAM_BOT_TOKEN}/setWebhook',
+        data=json.dumps(params).encode(), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        log.info(f'setWebhook: {response.read().decode()}')
+
+
+def run_webhook_server(build_application: ApplicationFactory, workers: int = WEBHOOK_WORKERS,
+                       host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT):
+    """
+    Receive updates on http://host:port/WEBHOOK_PATH and hand them to worker processes, sharded by chat id.
+
+    Each worker runs its own Application, so a chat's data, caches and ingestion queue all live in one process.
+    Blocks until interrupted or sent SIGTERM.
+    """
+    worker_queues = [multiprocessing.Queue(maxsize=WEBHOOK_QUEUE_SIZE) for _ in range(workers)]
+    # not daemonic, as daemonic processes can't start the PDF process pool. They are stopped below instead
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(i, worker_queue, build_application))
+        for i, worker_queue in enumerate(worker_queues)
+    ]
+    for process in processes:
+        process.start()
+
+    if WEBHOOK_URL:
+        set_webhook(WEBHOOK_URL, WEBHOOK_SECRET_TOKEN)
+
+    server = ThreadingHTTPServer((host, port), make_request_handler(worker_queues))
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    log.info(f'serving webhook on http://{host}:{port}{WEBHOOK_PATH} with {workers} workers')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for worker_queue in worker_queues:
+            worker_queue.put(None)
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                log.warning(f'webhook worker {process.name} did not stop, terminating it')
+                process.terminate()
+                process.join()
@@ -0,0 +1,32 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.synthetic_data import write_uob_statement_pdf
+from src.parsers import parse_statement
+
+
+class UOBParserTest(unittest.TestCase):
+    def parse(self, n_rows: int, previous_balance: float):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = Path(tmp_dir) / 'statement.pdf'
+            expected = write_uob_statement_pdf(pdf_path, n_rows, previous_balance=previous_balance)
+            return expected, parse_statement(pdf_path)
+
+    def test_sub_total_includes_previous_balance(self):
+        expected, rows = self.parse(80, previous_balance=1234.56)
+
+        self.assertIsNotNone(rows, 'statement was sent to the LLM instead of being parsed')
+        self.assertEqual(len(rows), len(expected))
+        self.assertEqual([(row['date'], float(row['price'])) for row in rows],
+                         [(row['date'], float(row['price'])) for row in expected])
+
+    def test_without_previous_balance(self):
+        expected, rows = self.parse(10, previous_balance=0)
+
+        self.assertIsNotNone(rows)
+        self.assertEqual(len(rows), len(expected))
+
+
+if __name__ == '__main__':
+    unittest.main()